@@ -7,8 +7,21 @@ import os
 import json
 from typing import List, Dict, Any, Optional, Tuple
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from pydantic import BaseModel, Field, ValidationError
+from tenacity import (
+    RetryCallState,
+    before_sleep_log,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    stop_after_delay,
+    wait_exponential_jitter,
+)
 import logging
+try:
+    import orjson
+except ImportError:  # optional: faster parsing of LLM responses
+    orjson = None
 try:
     from .validation_rules import IntentValidator
 except ImportError:
@@ -16,6 +29,113 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# System prompt for single-request intent extraction
+INTENT_SYSTEM_PROMPT = """You are an expert n8n workflow automation assistant specializing in intent extraction.
+
+INTEGRATION DETECTION RULES (CRITICAL - ALWAYS FOLLOW):
+- If user mentions "webhook" → ALWAYS include "Webhook" in integrations
+- If user mentions "form" or "submission" → ALWAYS include "Form" in integrations
+- If user mentions "schedule", "daily", "weekly" → ALWAYS include "Schedule" in integrations
+- Use GENERIC service names: "Email" not "Gmail", "Database" not "MySQL", "Storage" not "Dropbox"
+- Common n8n integrations: Slack, Discord, Email, Webhook, Form, Schedule, Database, HTTP Request, Sheets, Airtable
+
+TRIGGER TYPE DECISION RULES (Choose ONE):
+- webhook: External system calls your workflow (webhooks, form submissions, API calls, "when X happens", incoming data)
+- schedule: Time-based activation (daily, weekly, hourly, cron, "every day", automated timing)
+- manual: User manually starts workflow ("I want to run", "let me trigger", "start manually")
+- triggered: Activated by another workflow or internal service ("after another workflow", "chain workflows")
+
+EXAMPLES FOR REFERENCE:
+✓ "Create webhook for Slack" → integrations: ["Webhook", "Slack"], trigger: "webhook"
+✓ "Schedule daily reports to sheets" → integrations: ["Schedule", "Sheets"], trigger: "schedule"
+✓ "Email notifications for forms" → integrations: ["Email", "Form"], trigger: "webhook"
+✓ "Manual data processing to database" → integrations: ["Database"], trigger: "manual"
+✓ "When form submitted, send to Airtable" → integrations: ["Form", "Airtable"], trigger: "webhook"
+
+CRITICAL: For simple requests, be extra thorough in detecting ALL integrations and the correct trigger type.
+
+Respond in JSON format:
+{
+    "integrations": ["service1", "service2"],
+    "trigger_type": "webhook|schedule|manual|triggered",
+    "action": "brief description of what the workflow should do",
+    "requirements": ["requirement1", "requirement2"]
+}"""
+
+# Appended to INTENT_SYSTEM_PROMPT when several requests share one completion
+INTENT_BATCH_INSTRUCTIONS = """
+BATCH MODE: The user message is a JSON array of {"id": ..., "request": ...} objects.
+Apply the rules above to each request independently and respond with ONE JSON object:
+{
+    "results": [
+        {"id": 0, "integrations": [...], "trigger_type": "...", "action": "...", "requirements": [...]}
+    ]
+}
+Return exactly one result per request, in the same order, echoing each id."""
+
+_json_decoder = json.JSONDecoder()
+
+# Retries of transient OpenRouter failures. /chat waits on these calls, so the
+# total is bounded: no retry starts once _RETRY_BUDGET_S has passed since the
+# first attempt, and no single wait exceeds _MAX_RETRY_WAIT_S.
+_RETRY_BUDGET_S = 20.0
+_MAX_RETRY_WAIT_S = 10.0
+_retry_backoff = wait_exponential_jitter(initial=1, max=_MAX_RETRY_WAIT_S)
+_retry_stop = stop_after_attempt(5) | stop_after_delay(_RETRY_BUDGET_S)
+
+
+def _is_transient_error(exc: BaseException) -> bool:
+    """Retry rate limits, server errors and network failures, but not client errors"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = getattr(exc.response, "status_code", None)
+        return isinstance(status, int) and (status == 429 or status >= 500)
+    return isinstance(exc, httpx.TransportError)
+
+
+def _wait_for_retry(retry_state: RetryCallState) -> float:
+    """Honor a numeric Retry-After header, otherwise back off exponentially with jitter"""
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    if isinstance(exc, httpx.HTTPStatusError):
+        try:
+            return min(float(exc.response.headers.get("Retry-After")), _MAX_RETRY_WAIT_S)
+        except (AttributeError, TypeError, ValueError):
+            pass
+    return _retry_backoff(retry_state)
+
+
+class BatchIntentResult(BaseModel):
+    """One entry of a batched intent extraction response"""
+    # Strict, so a bool, float or numeric string is rejected rather than coerced onto a request
+    id: int = Field(strict=True)
+    integrations: List[str] = Field(default_factory=list)
+    trigger_type: str = "manual"
+    action: str = ""
+    requirements: List[str] = Field(default_factory=list)
+
+
+def parse_json_content(content: str) -> Dict[str, Any]:
+    """
+    Deterministically extract the first JSON object from an LLM response
+    
+    Handles markdown code fences and any prose before or after the object, so
+    the model only has to get the object itself right.
+    
+    Raises:
+        json.JSONDecodeError: If no JSON object can be decoded
+    """
+    if orjson is not None:
+        # Fast path for responses that are nothing but the JSON object
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            pass
+    
+    start = content.find("{")
+    if start == -1:
+        return json.loads(content.strip())
+    result, _ = _json_decoder.raw_decode(content, start)
+    return result
+
 
 class LLMClient:
     """Main LLM client interface that wraps OpenRouter client"""
@@ -33,6 +153,10 @@ class LLMClient:
         """List available models"""
         # Mock implementation for testing
         return ["openai/gpt-3.5-turbo", "openai/gpt-4", "anthropic/claude-2"]
+    
+    async def aclose(self) -> None:
+        """Release pooled HTTP connections"""
+        await self.openrouter.aclose()
 
 
 class OpenRouterClient:
@@ -50,13 +174,35 @@ class OpenRouterClient:
             "HTTP-Referer": "http://localhost:8001",  # Required by OpenRouter
             "X-Title": "n8n Workflow Agent"  # Optional, for OpenRouter dashboard
         }
+        # Stream structured (JSON) completions and stop reading once the object closes
+        self.stream_json = os.getenv("OPENROUTER_STREAM_JSON", "false").lower() == "true"
+        # Shared connection pool, created on first use and released by aclose()
+        self._client: Optional[httpx.AsyncClient] = None
         
         # Initialize validation framework
         self.validator = IntentValidator()
     
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the persistent HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """Close the persistent HTTP client and its pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
     @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
+        stop=_retry_stop,
+        wait=_wait_for_retry,
+        retry=retry_if_exception(_is_transient_error),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True
     )
     async def chat_completion(
         self,
@@ -64,7 +210,8 @@ class OpenRouterClient:
         model: Optional[str] = None,
         temperature: float = 0.7,
         max_tokens: int = 1000,
-        stream: bool = False
+        stream: bool = False,
+        response_format: Optional[Dict[str, str]] = None
     ) -> Dict[str, Any]:
         """
         Send a chat completion request to OpenRouter
@@ -75,32 +222,130 @@ class OpenRouterClient:
             temperature: Sampling temperature
             max_tokens: Maximum tokens in response
             stream: Whether to stream the response
+            response_format: Optional structured output format, e.g. {"type": "json_object"}
         
         Returns:
             Response from OpenRouter API
         """
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json={
-                        "model": model or self.default_model,
-                        "messages": messages,
-                        "temperature": temperature,
-                        "max_tokens": max_tokens,
-                        "stream": stream
-                    },
-                    timeout=30.0
-                )
+        payload = {
+            "model": model or self.default_model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": stream
+        }
+        if response_format:
+            payload["response_format"] = response_format
+        
+        client = self._get_client()
+        try:
+            response = await client.post(
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                json=payload,
+                timeout=30.0
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"OpenRouter API error: {e.response.text}")
+            raise
+        except Exception as e:
+            logger.error(f"Error calling OpenRouter: {str(e)}")
+            raise
+    
+    @retry(
+        stop=_retry_stop,
+        wait=_wait_for_retry,
+        retry=retry_if_exception(_is_transient_error),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True
+    )
+    async def stream_json_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        temperature: float = 0.1,
+        max_tokens: int = 400
+    ) -> Dict[str, Any]:
+        """
+        Stream a JSON-mode chat completion, stopping once the top-level object closes
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content'
+            model: Model to use (defaults to configured model)
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens in response
+        
+        Returns:
+            Response shaped like a non-streamed completion so callers parse it the same way
+        """
+        parts: List[str] = []
+        depth = 0
+        started = False
+        in_string = False
+        escaped = False
+        
+        client = self._get_client()
+        try:
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                json={
+                    "model": model or self.default_model,
+                    "messages": messages,
+                    "temperature": temperature,
+                    "max_tokens": max_tokens,
+                    "stream": True,
+                    "response_format": {"type": "json_object"}
+                },
+                timeout=30.0
+            ) as response:
+                if response.is_error:
+                    await response.aread()
                 response.raise_for_status()
-                return response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"OpenRouter API error: {e.response.text}")
-                raise
-            except Exception as e:
-                logger.error(f"Error calling OpenRouter: {str(e)}")
-                raise
+                    
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):]
+                    if data == "[DONE]":
+                        break
+                    
+                    chunk = json.loads(data)
+                    choices = chunk.get("choices") or [{}]
+                    delta = (choices[0].get("delta") or {}).get("content") or ""
+                    parts.append(delta)
+                    
+                    # Track brace depth outside of string literals
+                    for char in delta:
+                        if in_string:
+                            if escaped:
+                                escaped = False
+                            elif char == "\\":
+                                escaped = True
+                            elif char == '"':
+                                in_string = False
+                        elif char == '"':
+                            in_string = True
+                        elif char == "{":
+                            depth += 1
+                            started = True
+                        elif char == "}":
+                            depth -= 1
+                    
+                    if started and depth == 0:
+                        # Object is complete; leaving the context closes the stream early
+                        break
+        except httpx.HTTPStatusError as e:
+            logger.error(f"OpenRouter API error: {e.response.text}")
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming from OpenRouter: {str(e)}")
+            raise
+        
+        return {"choices": [{"message": {"content": "".join(parts)}}]}
     
     async def extract_intent(self, user_message: str) -> Dict[str, Any]:
         """
@@ -112,44 +357,13 @@ class OpenRouterClient:
         Returns:
             Extracted intent with integrations, trigger type, and description
         """
-        system_prompt = """You are an expert n8n workflow automation assistant specializing in intent extraction.
-
-INTEGRATION DETECTION RULES (CRITICAL - ALWAYS FOLLOW):
-- If user mentions "webhook" → ALWAYS include "Webhook" in integrations
-- If user mentions "form" or "submission" → ALWAYS include "Form" in integrations
-- If user mentions "schedule", "daily", "weekly" → ALWAYS include "Schedule" in integrations
-- Use GENERIC service names: "Email" not "Gmail", "Database" not "MySQL", "Storage" not "Dropbox"
-- Common n8n integrations: Slack, Discord, Email, Webhook, Form, Schedule, Database, HTTP Request, Sheets, Airtable
-
-TRIGGER TYPE DECISION RULES (Choose ONE):
-- webhook: External system calls your workflow (webhooks, form submissions, API calls, "when X happens", incoming data)
-- schedule: Time-based activation (daily, weekly, hourly, cron, "every day", automated timing)
-- manual: User manually starts workflow ("I want to run", "let me trigger", "start manually")
-- triggered: Activated by another workflow or internal service ("after another workflow", "chain workflows")
-
-EXAMPLES FOR REFERENCE:
-✓ "Create webhook for Slack" → integrations: ["Webhook", "Slack"], trigger: "webhook"
-✓ "Schedule daily reports to sheets" → integrations: ["Schedule", "Sheets"], trigger: "schedule"
-✓ "Email notifications for forms" → integrations: ["Email", "Form"], trigger: "webhook"
-✓ "Manual data processing to database" → integrations: ["Database"], trigger: "manual"
-✓ "When form submitted, send to Airtable" → integrations: ["Form", "Airtable"], trigger: "webhook"
-
-CRITICAL: For simple requests, be extra thorough in detecting ALL integrations and the correct trigger type.
-
-Respond in JSON format:
-{
-    "integrations": ["service1", "service2"],
-    "trigger_type": "webhook|schedule|manual|triggered",
-    "action": "brief description of what the workflow should do",
-    "requirements": ["requirement1", "requirement2"]
-}"""
-        
         messages = [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": INTENT_SYSTEM_PROMPT},
             {"role": "user", "content": user_message}
         ]
         
-        response = await self.chat_completion(
+        complete = self.stream_json_completion if self.stream_json else self.chat_completion
+        response = await complete(
             messages=messages,
             temperature=0.1,  # Very low temperature for consistent structured output
             max_tokens=400  # Reduced for more focused responses
@@ -158,13 +372,7 @@ Respond in JSON format:
         try:
             # Extract JSON from response
             content = response["choices"][0]["message"]["content"]
-            # Try to parse JSON, handling potential markdown code blocks
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
-            
-            return json.loads(content.strip())
+            return parse_json_content(content)
         except (json.JSONDecodeError, KeyError) as e:
             logger.error(f"Failed to parse intent: {e}")
             # Fallback to basic extraction
@@ -175,6 +383,67 @@ Respond in JSON format:
                 "requirements": []
             }
     
+    async def extract_intents_batch(self, user_messages: List[str]) -> List[Dict[str, Any]]:
+        """
+        Extract intents for several requests with a single chat completion
+        
+        Args:
+            user_messages: Natural language requests, in order
+        
+        Returns:
+            One intent per request in input order; requests the model did not
+            answer fall back to the same basic extraction as extract_intent
+        """
+        items = [{"id": i, "request": message} for i, message in enumerate(user_messages)]
+        messages = [
+            {"role": "system", "content": INTENT_SYSTEM_PROMPT + "\n" + INTENT_BATCH_INSTRUCTIONS},
+            {"role": "user", "content": json.dumps(items)}
+        ]
+        
+        response = await self.chat_completion(
+            messages=messages,
+            temperature=0.1,
+            max_tokens=400 * len(items),
+            response_format={"type": "json_object"}
+        )
+        
+        by_id: Dict[int, Dict[str, Any]] = {}
+        duplicated = set()
+        try:
+            content = response["choices"][0]["message"]["content"]
+            results = parse_json_content(content).get("results")
+            if not isinstance(results, list):
+                raise ValueError(f"expected a results list, got {type(results).__name__}")
+            for raw in results:
+                try:
+                    result = BatchIntentResult.model_validate(raw)
+                except ValidationError as e:
+                    logger.warning(f"Discarding malformed batch intent: {e}")
+                    continue
+                if not 0 <= result.id < len(items):
+                    logger.warning(f"Discarding batch intent for unknown id {result.id}")
+                elif result.id in by_id:
+                    duplicated.add(result.id)
+                else:
+                    by_id[result.id] = result.model_dump(exclude={"id"})
+        except (json.JSONDecodeError, KeyError, AttributeError, ValueError) as e:
+            logger.error(f"Failed to parse batch intents: {e}")
+        
+        # With two answers for one id there is no telling which is right, so use neither
+        for item_id in duplicated:
+            logger.warning(f"Discarding repeated batch intents for id {item_id}")
+            del by_id[item_id]
+        
+        return [
+            by_id.get(item["id"]) or {
+                "integrations": [],
+                "trigger_type": "manual",
+                "action": item["request"],
+                "requirements": []
+            }
+            for item in items
+        ]
+    
     async def extract_intent_with_validation(self, user_message: str) -> Tuple[Dict[str, Any], float, List[str]]:
         """
         Enhanced intent extraction with multi-pass validation and correction
@@ -190,11 +459,19 @@ Respond in JSON format:
         # Pass 1: Main extraction using improved prompt
         intent = await self.extract_intent(user_message)
         
+        # Both passes below match against the same lowercased text and trigger counts
+        message_lower = user_message.lower()
+        trigger_counts = self.validator.count_trigger_matches(message_lower)
+        
         # Pass 2: Validation and correction
-        validated_intent, corrections = self.validator.validate_and_correct_intent(intent, user_message)
+        validated_intent, corrections = self.validator.validate_and_correct_intent(
+            intent, user_message, message_lower, trigger_counts
+        )
         
         # Pass 3: Confidence scoring
-        confidence_score = self.validator.calculate_confidence_score(validated_intent, user_message)
+        confidence_score = self.validator.calculate_confidence_score(
+            validated_intent, user_message, message_lower, trigger_counts
+        )
         
         logger.info(f"Enhanced extraction complete. Confidence: {confidence_score:.2f}, Corrections: {len(corrections)}")
         
@@ -244,12 +521,7 @@ Response format: {{"score": 85, "reasoning": "..."}}"""
         
         try:
             content = response["choices"][0]["message"]["content"]
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0]
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0]
-            
-            result = json.loads(content.strip())
+            result = parse_json_content(content)
             return float(result.get("score", 50))
         except Exception as e:
             logger.error(f"Failed to parse score: {e}")
@@ -362,6 +362,8 @@ async def lifespan(app: FastAPI):
     try:
         if template_service_client:
             await template_service_client.close()
+        if llm_client:
+            await llm_client.aclose()
         logger.info("✅ Cleanup completed")
     except Exception as e:
         logger.error(f"Error during cleanup: {str(e)}")
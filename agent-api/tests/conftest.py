@@ -0,0 +1,187 @@
+"""
+Shared fixtures for the agent API test suites
+
+Plain helper functions live in helpers.py so test modules can import them.
+"""
+
+import json
+
+import pytest
+
+from helpers import mock_httpx_client
+
+# Message contents the mocked OpenRouter replies carry, encoded once at import
+_INTENT_PAYLOAD = json.dumps({
+    "integrations": ["slack", "webhook"],
+    "trigger_type": "webhook",
+    "action": "send notification",
+    "requirements": ["real-time"]
+})
+_SCORE_PAYLOAD = json.dumps({
+    "score": 88,
+    "reasoning": "Excellent match for requirements"
+})
+
+
+@pytest.fixture(scope="session")
+def mock_openrouter_responses():
+    """Fixture providing various mock OpenRouter responses"""
+    return {
+        "chat_completion": {
+            "choices": [{
+                "message": {
+                    "content": "This is a mocked chat completion response"
+                }
+            }],
+            "usage": {"total_tokens": 50}
+        },
+        "intent_extraction": {
+            "choices": [{
+                "message": {
+                    "content": _INTENT_PAYLOAD
+                }
+            }]
+        },
+        "template_scoring": {
+            "choices": [{
+                "message": {
+                    "content": _SCORE_PAYLOAD
+                }
+            }]
+        },
+        "response_generation": {
+            "choices": [{
+                "message": {
+                    "content": "I've successfully created your workflow! You can now customize it in the n8n editor."
+                }
+            }]
+        }
+    }
+
+
+@pytest.fixture(scope="session")
+def mock_n8n_responses():
+    """Fixture providing various mock n8n responses"""
+    return {
+        "workflow_creation": {
+            "id": "mock-workflow-123",
+            "name": "Mock Test Workflow",
+            "active": False,
+            "nodes": [
+                {
+                    "id": "trigger",
+                    "type": "n8n-nodes-base.webhook",
+                    "position": [240, 300]
+                },
+                {
+                    "id": "action",
+                    "type": "n8n-nodes-base.slack",
+                    "position": [460, 300]
+                }
+            ],
+            "connections": {
+                "trigger": {
+                    "main": [[{"node": "action", "type": "main", "index": 0}]]
+                }
+            }
+        },
+        "workflow_list": [
+            {"id": "1", "name": "Mock Workflow 1", "active": True},
+            {"id": "2", "name": "Mock Workflow 2", "active": False},
+            {"id": "3", "name": "Mock Workflow 3", "active": True}
+        ],
+        "workflow_detail": {
+            "id": "detail-workflow-456",
+            "name": "Detailed Mock Workflow",
+            "active": True,
+            "nodes": [],
+            "connections": {}
+        }
+    }
+
+
+@pytest.fixture(scope="session")
+def mock_template_responses():
+    """Fixture providing various mock template service responses"""
+    return {
+        "search_results": {
+            "results": [
+                {
+                    "id": "template-001",
+                    "name": "Slack Webhook Integration",
+                    "score": 0.95,
+                    "description": "Send Slack messages via webhooks"
+                },
+                {
+                    "id": "template-002",
+                    "name": "Email Automation",
+                    "score": 0.82,
+                    "description": "Automated email processing and responses"
+                },
+                {
+                    "id": "template-003",
+                    "name": "Discord Notifications",
+                    "score": 0.76,
+                    "description": "Send notifications to Discord channels"
+                }
+            ]
+        },
+        "template_detail": {
+            "id": "template-001",
+            "name": "Slack Webhook Integration",
+            "version": "1.2.0",
+            "workflow": {
+                "nodes": [
+                    {
+                        "id": "webhook-trigger",
+                        "type": "n8n-nodes-base.webhook",
+                        "parameters": {"path": "slack-webhook"}
+                    },
+                    {
+                        "id": "slack-sender",
+                        "type": "n8n-nodes-base.slack",
+                        "parameters": {"channel": "#general"}
+                    }
+                ],
+                "connections": {
+                    "webhook-trigger": {
+                        "main": [[{"node": "slack-sender", "type": "main", "index": 0}]]
+                    }
+                }
+            },
+            "metadata": {
+                "category": "messaging",
+                "tags": ["slack", "webhook", "notifications"]
+            }
+        },
+        "empty_results": {
+            "results": []
+        }
+    }
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """Skip real waits in retry/backoff paths so tests exercise only the logic"""
+    async def _noop(*args, **kwargs):
+        return None
+    
+    monkeypatch.setattr("asyncio.sleep", _noop)
+    monkeypatch.setattr("time.sleep", lambda *args, **kwargs: None)
+
+
+@pytest.fixture(scope="class")
+def patched_httpx():
+    """Patch httpx.AsyncClient once per test class and share a single mocked client"""
+    with mock_httpx_client() as patched:
+        yield patched
+
+
+@pytest.fixture
+def async_context(patched_httpx):
+    """Mocked HTTP client with calls and stubs from earlier tests cleared"""
+    _, async_context = patched_httpx
+    async_context.reset_mock(return_value=True, side_effect=True)
+    async_context.__aenter__.return_value = async_context
+    async_context.__aexit__.return_value = False
+    return async_context
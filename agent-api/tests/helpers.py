@@ -0,0 +1,74 @@
+"""
+Helpers shared by the agent API test suites
+
+Test modules import these directly; conftest.py holds only fixtures.
+"""
+
+from contextlib import contextmanager
+from types import MappingProxyType, SimpleNamespace
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock, Mock, patch
+
+import httpx
+
+# Imported for annotations only: langgraph_agent pulls in langgraph
+if TYPE_CHECKING:
+    from langgraph_agent import WorkflowState
+
+# Agent state with every optional field unset; tests override only what they exercise.
+# Read-only so no test can leak changes into the template.
+_DEFAULT_STATE = MappingProxyType({
+    "user_query": "",
+    "intent": None,
+    "candidates": None,
+    "selected_workflow": None,
+    "workflow_created": None,
+    "error": None,
+    "confidence_score": None,
+    "retry_count": 0
+})
+
+
+def make_state(**overrides) -> "WorkflowState":
+    """Return a fresh WorkflowState built from the defaults plus ``overrides``"""
+    state = _DEFAULT_STATE.copy()
+    state.update(overrides)
+    return state
+
+
+# Stand-in request for mocked HTTP errors; the clients never read it
+_FAKE_REQUEST = SimpleNamespace()
+
+
+def http_status_error(status, reason, text):
+    """Build the HTTPStatusError a failed response raises from ``raise_for_status``"""
+    return httpx.HTTPStatusError(
+        f"{status} {reason}",
+        request=_FAKE_REQUEST,
+        response=SimpleNamespace(status_code=status, text=text)
+    )
+
+
+def set_response(ctx, verb, *, json_body=None, raises=None, status=200):
+    """Stub the response returned by ``ctx.<verb>`` and return it"""
+    resp = Mock()
+    resp.status_code = status
+    resp.json = Mock(return_value=json_body)
+    resp.raise_for_status = Mock(side_effect=raises) if raises else Mock(return_value=None)
+    getattr(ctx, verb).return_value = resp
+    return resp
+
+
+@contextmanager
+def mock_httpx_client():
+    """Patch httpx.AsyncClient with a single mocked client for the duration of the block
+    
+    The mocked client is its own async context, so both persistent clients and
+    ``async with httpx.AsyncClient()`` blocks talk to the same ``async_context``.
+    Speccing it against the real client makes get/post/patch AsyncMocks up front.
+    """
+    async_context = AsyncMock(spec=httpx.AsyncClient)
+    with patch('httpx.AsyncClient') as mock_client:
+        mock_client.return_value = async_context
+        async_context.__aenter__.return_value = async_context
+        yield mock_client, async_context
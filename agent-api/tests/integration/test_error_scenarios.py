@@ -45,7 +45,7 @@ class TestLLMErrorScenarios:
             
             # Setup timeout error
             async_context = MagicMock()
-            mock_client.return_value.__aenter__.return_value = async_context
+            mock_client.return_value = async_context
             async_context.post.side_effect = httpx.TimeoutException("Request timeout")
             
             client = OpenRouterClient()
@@ -61,7 +61,7 @@ class TestLLMErrorScenarios:
             
             # Setup rate limit error
             async_context = MagicMock()
-            mock_client.return_value.__aenter__.return_value = async_context
+            mock_client.return_value = async_context
             
             mock_response = Mock()
             mock_response.status_code = 429
@@ -89,7 +89,7 @@ class TestLLMErrorScenarios:
             
             # Setup malformed response
             async_context = MagicMock()
-            mock_client.return_value.__aenter__.return_value = async_context
+            mock_client.return_value = async_context
             
             mock_response = Mock()
             mock_response.json.side_effect = json.JSONDecodeError("Invalid JSON", "", 0)
@@ -109,7 +109,7 @@ class TestLLMErrorScenarios:
             
             # Setup response with empty choices
             async_context = MagicMock()
-            mock_client.return_value.__aenter__.return_value = async_context
+            mock_client.return_value = async_context
             
             mock_response = Mock()
             mock_response.json.return_value = {"choices": []}
@@ -129,7 +129,7 @@ class TestLLMErrorScenarios:
             
             # Setup response with invalid JSON
             async_context = MagicMock()
-            mock_client.return_value.__aenter__.return_value = async_context
+            mock_client.return_value = async_context
             
             mock_response = Mock()
             mock_response.json.return_value = {
@@ -160,7 +160,7 @@ class TestLLMErrorScenarios:
             
             # Setup response with invalid score format
             async_context = MagicMock()
-            mock_client.return_value.__aenter__.return_value = async_context
+            mock_client.return_value = async_context
             
             mock_response = Mock()
             mock_response.json.return_value = {
@@ -6,129 +6,189 @@ Tests the improvements directly
 
 import asyncio
 import json
+import logging
 import time
 import os
 import sys
+from pathlib import Path
+from collections import Counter
 from typing import Dict, Any, List, Tuple
 
+try:
+    import orjson
+except ImportError:  # optional: faster serialization of the results file
+    orjson = None
+
+# Route report output through logging so CI can quiet it with LOG_LEVEL=WARNING
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler(sys.stdout))
+logger.setLevel(os.environ.get("LOG_LEVEL", "INFO"))
+logger.propagate = False
+
 # Set up environment - load API key from environment
 if "OPENROUTER_API_KEY" not in os.environ:
-    print("ERROR: OPENROUTER_API_KEY environment variable not set")
-    print("Please set: export OPENROUTER_API_KEY='your-api-key-here'")
+    logger.error("ERROR: OPENROUTER_API_KEY environment variable not set")
+    logger.error("Please set: export OPENROUTER_API_KEY='your-api-key-here'")
     sys.exit(1)
 
 # Add agent-api directory to path
-sys.path.insert(0, '/Users/cgordon/workstation/n8n-lab/agent-api')
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
 from llm_client import OpenRouterClient
 
+
+async def _timed_extract(client: OpenRouterClient, request: str) -> Tuple[Any, int]:
+    """Run one extraction and return (result or exception, elapsed ms)"""
+    start_ns = time.perf_counter_ns()
+    try:
+        result = await client.extract_intent_with_validation(request)
+    except Exception as e:
+        result = e
+    return result, (time.perf_counter_ns() - start_ns) // 1_000_000
+
+
+async def _batch_extract(client: OpenRouterClient, requests: List[str]) -> List[Tuple[Dict[str, Any], float, List[str]]]:
+    """Extract every request in one completion, then validate each intent locally"""
+    results = []
+    for request, intent in zip(requests, await client.extract_intents_batch(requests)):
+        request_lower = request.lower()
+        trigger_counts = client.validator.count_trigger_matches(request_lower)
+        validated_intent, corrections = client.validator.validate_and_correct_intent(
+            intent, request, request_lower, trigger_counts
+        )
+        confidence = client.validator.calculate_confidence_score(validated_intent, request, request_lower, trigger_counts)
+        results.append((validated_intent, confidence, corrections))
+    return results
+
+
+# Test cases that previously failed (from original comprehensive testing)
+TEST_CASES = [
+    {
+        "request": "Create a webhook that posts to Slack when triggered",
+        "expected": {
+            "integrations": ["Webhook", "Slack"],
+            "trigger_type": "webhook"
+        },
+        "category": "simple - previously failed",
+        "priority": "critical"
+    },
+    {
+        "request": "Send email notifications when form is submitted",
+        "expected": {
+            "integrations": ["Email", "Form"], 
+            "trigger_type": "webhook"
+        },
+        "category": "simple - previously failed",
+        "priority": "critical"
+    },
+    {
+        "request": "Schedule daily reports to Google Sheets",
+        "expected": {
+            "integrations": ["Schedule", "Sheets"],
+            "trigger_type": "schedule" 
+        },
+        "category": "simple - baseline",
+        "priority": "medium"
+    },
+    {
+        "request": "webhook for slack notifications",  # Minimal case
+        "expected": {
+            "integrations": ["Webhook", "Slack"],
+            "trigger_type": "webhook"
+        },
+        "category": "edge case",
+        "priority": "high"
+    },
+    {
+        "request": "Process form submissions and update CRM database",
+        "expected": {
+            "integrations": ["Form", "Database"],
+            "trigger_type": "webhook"
+        },
+        "category": "moderate - previously failed",
+        "priority": "critical"
+    }
+]
+
+# Pre-normalize expectations once so the per-case check is a frozenset comparison
+for _tc in TEST_CASES:
+    _tc['_exp_ints'] = frozenset(_tc['expected']['integrations'])
+    _tc['_exp_trig'] = _tc['expected']['trigger_type']
+
+
 async def test_enhanced_extraction():
     """Test the enhanced extraction on key problematic cases"""
     
     client = OpenRouterClient()
+    test_cases = TEST_CASES
     
-    # Test cases that previously failed (from original comprehensive testing)
-    test_cases = [
-        {
-            "request": "Create a webhook that posts to Slack when triggered",
-            "expected": {
-                "integrations": ["Webhook", "Slack"],
-                "trigger_type": "webhook"
-            },
-            "category": "simple - previously failed",
-            "priority": "critical"
-        },
-        {
-            "request": "Send email notifications when form is submitted",
-            "expected": {
-                "integrations": ["Email", "Form"], 
-                "trigger_type": "webhook"
-            },
-            "category": "simple - previously failed",
-            "priority": "critical"
-        },
-        {
-            "request": "Schedule daily reports to Google Sheets",
-            "expected": {
-                "integrations": ["Schedule", "Sheets"],
-                "trigger_type": "schedule" 
-            },
-            "category": "simple - baseline",
-            "priority": "medium"
-        },
-        {
-            "request": "webhook for slack notifications",  # Minimal case
-            "expected": {
-                "integrations": ["Webhook", "Slack"],
-                "trigger_type": "webhook"
-            },
-            "category": "edge case",
-            "priority": "high"
-        },
-        {
-            "request": "Process form submissions and update CRM database",
-            "expected": {
-                "integrations": ["Form", "Database"],
-                "trigger_type": "webhook"
-            },
-            "category": "moderate - previously failed",
-            "priority": "critical"
-        }
-    ]
-    
-    print("🧪 ENHANCED INTENT EXTRACTION VALIDATION TEST")
-    print("=" * 70)
-    print("Testing improvements to address:")
-    print("  ⚠️ Simple request processing (33.3% → 75%+ target)")
-    print("  ⚠️ Webhook detection gaps (frequently missed)")  
-    print("  ⚠️ Trigger type confusion (defaults to 'manual')")
-    print()
-    print("KEY IMPROVEMENTS IMPLEMENTED:")
-    print("  ✅ Enhanced system prompt with explicit detection rules")
-    print("  ✅ Multi-pass validation and correction framework")
-    print("  ✅ Optimized temperature (0.3 → 0.1) for consistency")
-    print("  ✅ Integration normalization (Gmail→Email, etc.)")
-    print()
-    
-    passed_tests = 0
+    logger.info("🧪 ENHANCED INTENT EXTRACTION VALIDATION TEST")
+    logger.info("=" * 70)
+    logger.info("Testing improvements to address:")
+    logger.info("  ⚠️ Simple request processing (33.3% → 75%+ target)")
+    logger.info("  ⚠️ Webhook detection gaps (frequently missed)")  
+    logger.info("  ⚠️ Trigger type confusion (defaults to 'manual')")
+    logger.info("")
+    logger.info("KEY IMPROVEMENTS IMPLEMENTED:")
+    logger.info("  ✅ Enhanced system prompt with explicit detection rules")
+    logger.info("  ✅ Multi-pass validation and correction framework")
+    logger.info("  ✅ Optimized temperature (0.3 → 0.1) for consistency")
+    logger.info("  ✅ Integration normalization (Gmail→Email, etc.)")
+    logger.info("")
+    
+    # Per-case metrics are preallocated and written by index
     total_tests = len(test_cases)
+    per_case_ms = [0] * total_tests
+    integration_matches = bytearray(total_tests)
+    trigger_matches = bytearray(total_tests)
     critical_passed = 0
     critical_total = 0
-    total_response_time = 0
-    all_corrections = []
+    correction_counts = Counter()
+    
+    # Buffer per-case output and flush it once after the loop
+    report_lines = []
+    
+    # BATCH=1 sends all requests in a single completion so both modes can be compared;
+    # otherwise every case is dispatched concurrently
+    if os.environ.get("BATCH") == "1":
+        start_ns = time.perf_counter_ns()
+        batch_results = await _batch_extract(client, [tc['request'] for tc in test_cases])
+        batch_case_ms = (time.perf_counter_ns() - start_ns) // 1_000_000 // total_tests
+        outcomes = [(result, batch_case_ms) for result in batch_results]
+    else:
+        outcomes = await asyncio.gather(*(_timed_extract(client, tc['request']) for tc in test_cases))
     
     for i, test_case in enumerate(test_cases):
-        print(f"Test {i+1}/{total_tests}: {test_case['category']}")
-        print(f"Request: '{test_case['request']}'")
-        print(f"Expected: {test_case['expected']}")
+        report_lines.append(f"Test {i+1}/{total_tests}: {test_case['category']}")
+        report_lines.append(f"Request: '{test_case['request']}'")
+        report_lines.append(f"Expected: {test_case['expected']}")
         
-        start_time = time.time()
+        outcome, response_time = outcomes[i]
+        if isinstance(outcome, Exception):
+            report_lines.append(f"❌ ERROR: {str(outcome)}")
+            report_lines.append("")
+            continue
         
         try:
-            # Test enhanced extraction method
-            intent, confidence, corrections = await client.extract_intent_with_validation(
-                test_case['request']
-            )
-            
-            response_time = (time.time() - start_time) * 1000
-            total_response_time += response_time
+            intent, confidence, corrections = outcome
+            per_case_ms[i] = response_time
             
             if corrections:
-                all_corrections.extend(corrections)
+                correction_counts.update(corrections)
             
             # Evaluate result
-            actual_integrations = set(intent.get('integrations', []))
-            expected_integrations = set(test_case['expected'].get('integrations', []))
+            actual_integrations = frozenset(intent.get('integrations', ()))
+            expected_integrations = test_case['_exp_ints']
             
             actual_trigger = intent.get('trigger_type', '')
-            expected_trigger = test_case['expected'].get('trigger_type', '')
+            expected_trigger = test_case['_exp_trig']
             
             integrations_match = actual_integrations == expected_integrations
             trigger_match = actual_trigger == expected_trigger
             
+            integration_matches[i] = integrations_match
+            trigger_matches[i] = trigger_match
             passed = integrations_match and trigger_match
-            if passed:
-                passed_tests += 1
             
             # Track critical test performance
             if test_case['priority'] == 'critical':
@@ -140,107 +200,111 @@ async def test_enhanced_extraction():
             status = "✅ PASSED" if passed else "❌ FAILED"
             priority_icon = "🔥" if test_case['priority'] == 'critical' else "⚡" if test_case['priority'] == 'high' else "📝"
             
-            print(f"Result: {status} {priority_icon}")
-            print(f"  Extracted: integrations={list(intent.get('integrations', []))}, trigger='{intent.get('trigger_type', '')}'")
-            print(f"  Confidence: {confidence:.2f} | Response Time: {response_time:.0f}ms")
+            report_lines.append(f"Result: {status} {priority_icon}")
+            report_lines.append(f"  Extracted: integrations={list(intent.get('integrations', []))}, trigger='{intent.get('trigger_type', '')}'")
+            report_lines.append(f"  Confidence: {confidence:.2f} | Response Time: {response_time}ms")
             
             if corrections:
-                print(f"  🔧 Corrections Applied: {corrections}")
+                report_lines.append(f"  🔧 Corrections Applied: {corrections}")
             
             if not passed:
                 if not integrations_match:
                     missing = expected_integrations - actual_integrations
                     extra = actual_integrations - expected_integrations
                     if missing:
-                        print(f"  ❌ Missing integrations: {list(missing)}")
+                        report_lines.append(f"  ❌ Missing integrations: {list(missing)}")
                     if extra:
-                        print(f"  ❌ Extra integrations: {list(extra)}")
+                        report_lines.append(f"  ❌ Extra integrations: {list(extra)}")
                 
                 if not trigger_match:
-                    print(f"  ❌ Wrong trigger: got '{actual_trigger}', expected '{expected_trigger}'")
+                    report_lines.append(f"  ❌ Wrong trigger: got '{actual_trigger}', expected '{expected_trigger}'")
             
-            print()
+            report_lines.append("")
             
         except Exception as e:
-            print(f"❌ ERROR: {str(e)}")
-            print()
+            report_lines.append(f"❌ ERROR: {str(e)}")
+            report_lines.append("")
+    
+    logger.info("\n".join(report_lines))
     
     # Calculate metrics
+    passed_tests = sum(a & b for a, b in zip(integration_matches, trigger_matches))
     pass_rate = (passed_tests / total_tests) * 100
     critical_pass_rate = (critical_passed / critical_total) * 100 if critical_total > 0 else 0
-    avg_response_time = total_response_time / total_tests
+    avg_response_time = sum(per_case_ms) / total_tests
+    total_corrections = sum(correction_counts.values())
     
     # Summary
-    print("=" * 70)
-    print("🎯 VALIDATION RESULTS")
-    print("=" * 70)
-    print(f"Overall Performance: {passed_tests}/{total_tests} ({pass_rate:.1f}%)")
-    print(f"Critical Tests (previously failed): {critical_passed}/{critical_total} ({critical_pass_rate:.1f}%)")
-    print(f"Average Response Time: {avg_response_time:.0f}ms")
-    print(f"Total Corrections Applied: {len(all_corrections)}")
-    
-    print(f"\n📊 IMPROVEMENT ANALYSIS:")
-    print(f"  Baseline Simple Category: 33.3% pass rate")
-    print(f"  Current Performance: {pass_rate:.1f}% pass rate")
+    logger.info("=" * 70)
+    logger.info("🎯 VALIDATION RESULTS")
+    logger.info("=" * 70)
+    logger.info(f"Overall Performance: {passed_tests}/{total_tests} ({pass_rate:.1f}%)")
+    logger.info(f"Critical Tests (previously failed): {critical_passed}/{critical_total} ({critical_pass_rate:.1f}%)")
+    logger.info(f"Average Response Time: {avg_response_time:.0f}ms")
+    logger.info(f"Total Corrections Applied: {total_corrections}")
+    
+    logger.info(f"\n📊 IMPROVEMENT ANALYSIS:")
+    logger.info(f"  Baseline Simple Category: 33.3% pass rate")
+    logger.info(f"  Current Performance: {pass_rate:.1f}% pass rate")
     improvement = pass_rate - 33.3
-    print(f"  Improvement: {improvement:+.1f} percentage points")
+    logger.info(f"  Improvement: {improvement:+.1f} percentage points")
     
-    print(f"\n🔧 CORRECTION EFFECTIVENESS:")
-    if all_corrections:
-        from collections import Counter
-        correction_counts = Counter(all_corrections)
+    logger.info(f"\n🔧 CORRECTION EFFECTIVENESS:")
+    if correction_counts:
         for correction, count in correction_counts.most_common():
-            print(f"  • {correction}: {count} times")
+            logger.info(f"  • {correction}: {count} times")
     else:
-        print("  • No corrections needed - extractions were accurate")
+        logger.info("  • No corrections needed - extractions were accurate")
     
     # Assessment
-    print(f"\n🏆 ASSESSMENT:")
+    logger.info(f"\n🏆 ASSESSMENT:")
     if pass_rate >= 80:
-        print("✅ EXCELLENT: Target achieved! Ready for production")
+        logger.info("✅ EXCELLENT: Target achieved! Ready for production")
     elif pass_rate >= 75:
-        print("✅ SUCCESS: Significant improvement, minor refinement needed")
+        logger.info("✅ SUCCESS: Significant improvement, minor refinement needed")
     elif pass_rate >= 60:
-        print("⚠️ PROGRESS: Good improvement, needs more work")
+        logger.info("⚠️ PROGRESS: Good improvement, needs more work")
     elif pass_rate > 33.3:
-        print("⚠️ SOME PROGRESS: Improvement detected but insufficient")
+        logger.info("⚠️ SOME PROGRESS: Improvement detected but insufficient")
     else:
-        print("❌ NO IMPROVEMENT: Further changes required")
+        logger.info("❌ NO IMPROVEMENT: Further changes required")
     
-    print(f"\n📋 NEXT STEPS:")
+    logger.info(f"\n📋 NEXT STEPS:")
     if pass_rate >= 75:
-        print("  1. Deploy to production with current improvements")
-        print("  2. Monitor performance in real-world usage") 
-        print("  3. Collect user feedback for fine-tuning")
+        logger.info("  1. Deploy to production with current improvements")
+        logger.info("  2. Monitor performance in real-world usage") 
+        logger.info("  3. Collect user feedback for fine-tuning")
     else:
-        print("  1. Analyze remaining failures")
-        print("  2. Refine system prompt further")
-        print("  3. Add more specific validation rules")
+        logger.info("  1. Analyze remaining failures")
+        logger.info("  2. Refine system prompt further")
+        logger.info("  3. Add more specific validation rules")
     
     return {
         "pass_rate": pass_rate,
         "critical_pass_rate": critical_pass_rate,
         "avg_response_time": avg_response_time,
-        "corrections_applied": len(all_corrections),
+        "corrections_applied": total_corrections,
         "success": pass_rate >= 75
     }
 
 async def main():
     """Run the enhanced extraction validation"""
-    print("🚀 Starting Enhanced Intent Extraction Validation...")
+    logger.info("🚀 Starting Enhanced Intent Extraction Validation...")
     results = await test_enhanced_extraction()
     
     # Save results
-    results_file = "/Users/cgordon/workstation/n8n-lab/enhanced_extraction_results.json"
-    with open(results_file, "w") as f:
-        json.dump(results, f, indent=2)
+    results_file = Path(__file__).parent / "enhanced_extraction_results.json"
+    if orjson is not None:
+        results_file.write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+    else:
+        results_file.write_text(json.dumps(results, indent=2), encoding="utf-8")
     
-    print(f"\n💾 Results saved to: {results_file}")
+    logger.info(f"\n💾 Results saved to: {results_file}")
     
     if results["success"]:
-        print("🎉 SUCCESS: Enhanced intent extraction is ready for production!")
+        logger.info("🎉 SUCCESS: Enhanced intent extraction is ready for production!")
     else:
-        print("🔄 NEEDS REFINEMENT: Continue with additional improvements")
+        logger.info("🔄 NEEDS REFINEMENT: Continue with additional improvements")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -7,53 +7,217 @@ Run with: pytest test_unit.py -m unit
 """
 
 import asyncio
+import copy
+import itertools
 import json
 import os
+import time
 import uuid
 from datetime import datetime
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, Mock, patch
 from typing import Dict, Any, List
 
 import httpx
 import pytest
 from faker import Faker
+from tenacity import RetryCallState
 
 # Import modules under test
-from llm_client import LLMClient, OpenRouterClient
+from llm_client import (
+    _MAX_RETRY_WAIT_S,
+    _RETRY_BUDGET_S,
+    LLMClient,
+    OpenRouterClient,
+    _is_transient_error,
+    parse_json_content,
+    _retry_stop,
+    _wait_for_retry,
+)
 from n8n_client import N8nClient
-from langgraph_agent import WorkflowAgent, WorkflowState, create_workflow_agent
+from validation_rules import IntentValidator
+
+from helpers import http_status_error, make_state, mock_httpx_client, set_response
+
+# Every test in this module is a unit test; asyncio_mode = auto in pytest.ini runs the async ones
+pytestmark = pytest.mark.unit
 
 fake = Faker()
 
+# Fake values drawn once at import and cycled through by the data generators
+_FAKE_UUIDS = [fake.uuid4() for _ in range(64)]
+_FAKE_PHRASES = [fake.catch_phrase() for _ in range(64)]
+_FAKE_URLS = [fake.url() for _ in range(64)]
+_uuid_iter = itertools.cycle(_FAKE_UUIDS)
+_phrase_iter = itertools.cycle(_FAKE_PHRASES)
+_url_iter = itertools.cycle(_FAKE_URLS)
+
+# HTTP errors raised by the mocked OpenRouter and n8n responses
+_HTTP_400 = http_status_error(400, "Bad Request", "Bad request")
+_HTTP_401 = http_status_error(401, "Unauthorized", "Unauthorized")
+_HTTP_404 = http_status_error(404, "Not Found", "Workflow not found")
+
+# Intents the mocked LLM replies with, serialized once at import
+_SLACK_GMAIL_INTENT = {
+    "integrations": ["slack", "gmail"],
+    "trigger_type": "webhook",
+    "action": "send notification",
+    "requirements": ["real-time"]
+}
+_SLACK_GMAIL_INTENT_JSON = json.dumps(_SLACK_GMAIL_INTENT)
+_DISCORD_INTENT = {
+    "integrations": ["discord"],
+    "trigger_type": "schedule",
+    "action": "post message",
+    "requirements": []
+}
+_DISCORD_INTENT_CODEBLOCK = f"```json\n{json.dumps(_DISCORD_INTENT)}\n```"
+_SLACK_INTENT = {
+    "integrations": ["slack"],
+    "trigger_type": "webhook",
+    "action": "send_message",
+    "requirements": [],
+    "complexity": "simple"
+}
+_SLACK_INTENT_JSON = json.dumps(_SLACK_INTENT)
+
+# Golden test data shared read-only by the tests; the code under test copies
+# rather than mutates it, so no test needs its own instance
+_MOCK_WORKFLOWS = [
+    {"id": "1", "name": "Workflow 1", "active": True},
+    {"id": "2", "name": "Workflow 2", "active": False}
+]
+_MOCK_INTENT_SLACK_WEBHOOK = {
+    "integrations": ["slack", "webhook"],
+    "trigger_type": "webhook",
+    "action": "send_message",
+    "requirements": []
+}
+_MOCK_INTENT_SLACK = {
+    "integrations": ["slack"],
+    "trigger_type": "webhook",
+    "action": "send_message"
+}
+_MOCK_CANDIDATES_SLACK_EMAIL = [
+    {
+        "id": "template1",
+        "name": "Slack Webhook",
+        "description": "Send Slack messages via webhook",
+        "integrations": ["slack", "webhook"],
+        "category": "messaging"
+    },
+    {
+        "id": "template2",
+        "name": "Email Alert",
+        "description": "Send email alerts",
+        "integrations": ["email"],
+        "category": "notifications"
+    }
+]
+_MOCK_CANDIDATES_RANKED = [
+    {
+        "id": "template1",
+        "name": "Best Template",
+        "description": "The best matching template",
+        "score": 0.95
+    },
+    {
+        "id": "template2",
+        "name": "Second Template",
+        "description": "Second best template",
+        "score": 0.75
+    }
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def openrouter_api_key():
+    """Provide the OpenRouter API key once for the whole module"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('OPENROUTER_API_KEY', 'test-key-12345')
+        yield
+
+
+# Mean per-call budgets for the agent latency guards, with ample headroom for slow CI hosts
+_PARSE_INTENT_BUDGET_S = 0.005
+_SCORE_CANDIDATES_BUDGET_S = 0.02
+
+
+async def mean_latency(call, rounds=50):
+    """Return the mean wall time in seconds of awaiting ``call()`` ``rounds`` times"""
+    start_ns = time.perf_counter_ns()
+    for _ in range(rounds):
+        await call()
+    return (time.perf_counter_ns() - start_ns) / rounds / 1e9
+
+
+@pytest.fixture(scope="session")
+def agent_module():
+    """The langgraph_agent module, imported only once a test needs the agent
+    
+    Importing it pulls in langgraph, which dominates collection time for the
+    LLM and n8n client tests that never touch the agent.
+    """
+    import langgraph_agent
+    return langgraph_agent
+
+
+@pytest.fixture(scope="module", autouse=True)
+def patched_httpx():
+    """Keep httpx.AsyncClient patched for the whole module; no test here makes real requests"""
+    with mock_httpx_client() as patched:
+        yield patched
+
+
+# Requests for the batched extraction tests; answers name the request they belong to
+_BATCH_REQUESTS = ["Send Slack alerts", "Back up files to Drive daily", "Email the weekly report"]
+
+
+def _batch_intent(answer_id, service=None):
+    """The intent a batch answer with ``answer_id`` carries"""
+    return {
+        "integrations": [service or f"Service{answer_id}"],
+        "trigger_type": "webhook",
+        "action": f"handle request {answer_id}",
+        "requirements": []
+    }
+
+
+def _batch_answer(answer_id, service=None):
+    """One entry of a batched reply's results list"""
+    return {"id": answer_id, **_batch_intent(answer_id, service)}
+
 
 class TestLLMClient:
     """Unit tests for LLM Client components"""
     
+    @pytest.fixture(scope="class")
+    @classmethod
+    def _openrouter_client(cls):
+        """OpenRouter client built once for the class"""
+        return OpenRouterClient()
+    
     @pytest.fixture
-    def mock_openrouter_client(self):
-        """Mock OpenRouter client for testing"""
-        with patch.dict(os.environ, {'OPENROUTER_API_KEY': 'test-key-12345'}):
-            client = OpenRouterClient()
-            return client
+    def mock_openrouter_client(self, _openrouter_client):
+        """Shared OpenRouter client, dropping any HTTP client a test left behind"""
+        yield _openrouter_client
+        _openrouter_client._client = None
     
-    @pytest.mark.unit
     def test_openrouter_client_init_with_api_key(self):
         """Test OpenRouter client initialization with API key"""
-        with patch.dict(os.environ, {'OPENROUTER_API_KEY': 'test-key'}):
-            client = OpenRouterClient()
-            assert client.api_key == 'test-key'
-            assert client.base_url == "https://openrouter.ai/api/v1"
-            assert client.default_model == "openai/gpt-3.5-turbo"
+        # The key comes from the module-wide openrouter_api_key fixture
+        client = OpenRouterClient()
+        assert client.api_key == 'test-key-12345'
+        assert client.base_url == "https://openrouter.ai/api/v1"
+        assert client.default_model == "openai/gpt-3.5-turbo"
     
-    @pytest.mark.unit
     def test_openrouter_client_init_without_api_key(self):
         """Test OpenRouter client fails without API key"""
         with patch.dict(os.environ, {}, clear=True):
             with pytest.raises(ValueError, match="OpenRouter API key not provided"):
                 OpenRouterClient()
     
-    @pytest.mark.unit
-    async def test_chat_completion_success(self, mock_openrouter_client):
+    async def test_chat_completion_success(self, async_context, mock_openrouter_client):
         """Test successful chat completion"""
         mock_response = {
             "choices": [{
@@ -63,51 +227,29 @@ class TestLLMClient:
             }],
             "usage": {"total_tokens": 50}
         }
+        set_response(async_context, "post", json_body=mock_response)
         
-        with patch('httpx.AsyncClient') as mock_client:
-            mock_client.return_value.__aenter__.return_value.post.return_value.json.return_value = mock_response
-            mock_client.return_value.__aenter__.return_value.post.return_value.raise_for_status.return_value = None
-            
-            messages = [{"role": "user", "content": "Hello"}]
-            result = await mock_openrouter_client.chat_completion(messages)
-            
-            assert result == mock_response
-            assert result["choices"][0]["message"]["content"] == "Test response from OpenRouter"
+        messages = [{"role": "user", "content": "Hello"}]
+        result = await mock_openrouter_client.chat_completion(messages)
+        
+        assert result == mock_response
+        assert result["choices"][0]["message"]["content"] == "Test response from OpenRouter"
     
-    @pytest.mark.unit
-    async def test_chat_completion_http_error(self, mock_openrouter_client):
+    async def test_chat_completion_http_error(self, async_context, mock_openrouter_client):
         """Test chat completion HTTP error handling"""
-        with patch('httpx.AsyncClient') as mock_client:
-            mock_response = Mock()
-            mock_response.status_code = 401
-            mock_response.text = "Unauthorized"
-            
-            http_error = httpx.HTTPStatusError(
-                "401 Unauthorized", 
-                request=Mock(), 
-                response=mock_response
-            )
-            mock_client.return_value.__aenter__.return_value.post.return_value.raise_for_status.side_effect = http_error
-            
-            messages = [{"role": "user", "content": "Hello"}]
-            
-            with pytest.raises(httpx.HTTPStatusError):
-                await mock_openrouter_client.chat_completion(messages)
+        set_response(async_context, "post", raises=_HTTP_401, status=401)
+        
+        messages = [{"role": "user", "content": "Hello"}]
+        
+        with pytest.raises(httpx.HTTPStatusError):
+            await mock_openrouter_client.chat_completion(messages)
     
-    @pytest.mark.unit
     async def test_extract_intent_valid_json(self, mock_openrouter_client):
         """Test intent extraction with valid JSON response"""
-        mock_intent = {
-            "integrations": ["slack", "gmail"],
-            "trigger_type": "webhook",
-            "action": "send notification",
-            "requirements": ["real-time"]
-        }
-        
         mock_response = {
             "choices": [{
                 "message": {
-                    "content": json.dumps(mock_intent)
+                    "content": _SLACK_GMAIL_INTENT_JSON
                 }
             }]
         }
@@ -116,11 +258,10 @@ class TestLLMClient:
             user_message = "Send Slack notification when new email arrives"
             result = await mock_openrouter_client.extract_intent(user_message)
             
-            assert result == mock_intent
+            assert result == _SLACK_GMAIL_INTENT
             assert result["integrations"] == ["slack", "gmail"]
             assert result["trigger_type"] == "webhook"
     
-    @pytest.mark.unit
     async def test_extract_intent_invalid_json(self, mock_openrouter_client):
         """Test intent extraction with invalid JSON fallback"""
         mock_response = {
@@ -142,20 +283,12 @@ class TestLLMClient:
             assert result["trigger_type"] == "manual"
             assert result["action"] == user_message
     
-    @pytest.mark.unit
     async def test_extract_intent_with_code_block(self, mock_openrouter_client):
         """Test intent extraction with JSON in code block"""
-        mock_intent = {
-            "integrations": ["discord"],
-            "trigger_type": "schedule",
-            "action": "post message",
-            "requirements": []
-        }
-        
         mock_response = {
             "choices": [{
                 "message": {
-                    "content": f"```json\n{json.dumps(mock_intent)}\n```"
+                    "content": _DISCORD_INTENT_CODEBLOCK
                 }
             }]
         }
@@ -164,9 +297,8 @@ class TestLLMClient:
             user_message = "Schedule Discord messages"
             result = await mock_openrouter_client.extract_intent(user_message)
             
-            assert result == mock_intent
+            assert result == _DISCORD_INTENT
     
-    @pytest.mark.unit
     async def test_score_template_match_success(self, mock_openrouter_client):
         """Test template scoring with valid response"""
         mock_response = {
@@ -187,7 +319,6 @@ class TestLLMClient:
             
             assert score == 85.0
     
-    @pytest.mark.unit
     async def test_score_template_match_fallback(self, mock_openrouter_client):
         """Test template scoring with fallback logic"""
         mock_response = {
@@ -211,68 +342,239 @@ class TestLLMClient:
             assert 0 <= score <= 100
             # Should get bonus points for matching integrations
             assert score > 50  # Base score + integration matches
+    
+    @pytest.mark.parametrize("content,answered", [
+        (json.dumps({"results": [_batch_answer(2), _batch_answer(0), _batch_answer(1)]}), [0, 1, 2]),
+        (json.dumps({"results": [_batch_answer(0), _batch_answer(2)]}), [0, None, 2]),
+        (
+            json.dumps({"results": [_batch_answer(0), _batch_answer(1), _batch_answer(1, "Other"), _batch_answer(2)]}),
+            [0, None, 2]
+        ),
+        (json.dumps({"results": [_batch_answer(0), _batch_answer(1), _batch_answer(3), _batch_answer(-1)]}), [0, 1, None]),
+        (
+            json.dumps({"results": [
+                {**_batch_answer(0), "id": "0"},
+                {**_batch_answer(1), "id": True},
+                {**_batch_answer(2), "id": 2.0},
+            ]}),
+            [None, None, None]
+        ),
+        (json.dumps([_batch_answer(0), _batch_answer(1), _batch_answer(2)]), [None, None, None]),
+        (json.dumps({"results": _batch_answer(0)}), [None, None, None]),
+        ("The model replied in prose", [None, None, None]),
+    ], ids=["out-of-order", "missing", "duplicated", "out-of-range", "non-integer", "top-level-array",
+            "results-not-a-list", "not-json"])
+    async def test_extract_intents_batch_maps_results_by_id(self, mock_openrouter_client, content, answered):
+        """Batch answers pair with requests by id; anything unpairable falls back per request"""
+        mock_response = {"choices": [{"message": {"content": content}}]}
+        
+        with patch.object(mock_openrouter_client, 'chat_completion', return_value=mock_response):
+            results = await mock_openrouter_client.extract_intents_batch(_BATCH_REQUESTS)
+        
+        expected = [
+            _batch_intent(answer_id) if answer_id is not None else {
+                "integrations": [],
+                "trigger_type": "manual",
+                "action": request,
+                "requirements": []
+            }
+            for request, answer_id in zip(_BATCH_REQUESTS, answered)
+        ]
+        assert results == expected
+
+
+class TestParseJsonContent:
+    """Unit tests for the shared LLM response JSON extractor"""
+    
+    @pytest.mark.parametrize("content,expected", [
+        ('{"score": 85}', {"score": 85}),
+        ('```json\n{"score": 85, "reasoning": "Good"}\n```', {"score": 85, "reasoning": "Good"}),
+        ('```\n{"score": 85}\n```', {"score": 85}),
+        ('Here is the intent you asked for:\n{"trigger_type": "webhook"}', {"trigger_type": "webhook"}),
+        ('{"trigger_type": "schedule"}\nLet me know if you need anything else.', {"trigger_type": "schedule"}),
+        ('{"a": 1} and then {"b": 2}', {"a": 1}),
+        (
+            'Result: {"intent": {"integrations": ["Slack"], "meta": {"depth": 2}}, "note": "uses {braces}"} done',
+            {"intent": {"integrations": ["Slack"], "meta": {"depth": 2}}, "note": "uses {braces}"}
+        ),
+    ], ids=["bare", "json-fence", "plain-fence", "leading-prose", "trailing-text", "first-of-two", "nested-braces"])
+    def test_extracts_first_object(self, content, expected):
+        """The first JSON object is returned whatever surrounds it"""
+        assert parse_json_content(content) == expected
+    
+    @pytest.mark.parametrize("content", [
+        "This is not valid JSON",
+        "",
+        '{"integrations": ["Slack"',
+    ], ids=["prose", "empty", "unterminated"])
+    def test_raises_without_object(self, content):
+        """Content with no complete object raises JSONDecodeError for callers to fall back on"""
+        with pytest.raises(json.JSONDecodeError):
+            parse_json_content(content)
+
+
+def _retry_state(exc, attempt_number=1):
+    """Retry state after ``exc`` was raised on attempt ``attempt_number``"""
+    state = RetryCallState(retry_object=None, fn=None, args=(), kwargs={})
+    state.attempt_number = attempt_number
+    state.set_exception((type(exc), exc, None))
+    return state
+
+
+def _status_error(status, headers=None):
+    """HTTPStatusError carrying a real response, so headers can be read"""
+    request = httpx.Request("POST", "https://openrouter.ai/api/v1/chat/completions")
+    return httpx.HTTPStatusError(
+        f"{status}",
+        request=request,
+        response=httpx.Response(status, headers=headers, request=request)
+    )
+
+
+class TestRetryPolicy:
+    """Unit tests for the OpenRouter retry predicate, wait and stop policy"""
+    
+    @pytest.mark.parametrize("exc,expected", [
+        (_status_error(429), True),
+        (_status_error(500), True),
+        (_status_error(503), True),
+        (httpx.ConnectError("connection refused"), True),
+        (httpx.ReadTimeout("read timed out"), True),
+        (_status_error(400), False),
+        (_status_error(401), False),
+        (_status_error(404), False),
+        (ValueError("malformed response"), False),
+    ], ids=["429", "500", "503", "connect-error", "read-timeout", "400", "401", "404", "value-error"])
+    def test_is_transient_error(self, exc, expected):
+        """Rate limits, server errors and transport errors retry; client errors don't"""
+        assert _is_transient_error(exc) is expected
+    
+    @pytest.mark.parametrize("retry_after,expected", [
+        ("3", 3.0),
+        ("0.5", 0.5),
+        ("120", _MAX_RETRY_WAIT_S),
+    ], ids=["seconds", "fractional", "capped"])
+    def test_wait_honors_retry_after(self, retry_after, expected):
+        """A numeric Retry-After is waited out, but never longer than the cap"""
+        state = _retry_state(_status_error(429, headers={"Retry-After": retry_after}))
+        
+        assert _wait_for_retry(state) == expected
+    
+    @pytest.mark.parametrize("exc", [
+        _status_error(503),
+        _status_error(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}),
+        httpx.ConnectError("connection refused"),
+    ], ids=["no-header", "http-date", "transport-error"])
+    def test_wait_falls_back_to_capped_backoff(self, exc):
+        """Without a numeric Retry-After the jittered backoff applies, within the cap"""
+        for attempt_number in range(1, 8):
+            wait = _wait_for_retry(_retry_state(exc, attempt_number))
+            assert 0 < wait <= _MAX_RETRY_WAIT_S
+    
+    @pytest.mark.parametrize("attempt_number,elapsed,expected", [
+        (1, 0.0, False),
+        (4, _RETRY_BUDGET_S - 1, False),
+        (5, 0.0, True),
+        (2, _RETRY_BUDGET_S + 1, True),
+    ], ids=["first-attempt", "within-budget", "attempts-exhausted", "budget-exhausted"])
+    def test_stop_bounds_attempts_and_total_time(self, attempt_number, elapsed, expected):
+        """Retrying stops after five attempts or once the time budget is spent"""
+        state = SimpleNamespace(attempt_number=attempt_number, seconds_since_start=elapsed)
+        
+        assert _retry_stop(state) is expected
+
+
+class TestIntentValidator:
+    """Unit tests for rule-based intent scoring"""
+    
+    _REQUEST = "Send a Slack message when a webhook fires every day"
+    
+    @pytest.mark.parametrize("intent,expected", [
+        # structure 0.3 + evidence 2/2 * 0.3 + one webhook indicator 0.5 * 0.2 + action 0.2
+        (
+            {"integrations": ["Slack", "Webhook"], "trigger_type": "webhook", "action": "Post to Slack on webhook"},
+            0.9
+        ),
+        # structure 0.3 + evidence 1/2 * 0.3 + one schedule indicator 0.5 * 0.2; action too short
+        ({"integrations": ["Slack", "Discord"], "trigger_type": "schedule", "action": "short"}, 0.55),
+        # structure 0.3 + evidence 0.3; no manual indicators, and an echoed request earns nothing
+        ({"integrations": ["Slack"], "trigger_type": "manual", "action": _REQUEST}, 0.6),
+        ({}, 0.0),
+    ], ids=["well-supported", "partly-supported", "echoed-action", "empty"])
+    def test_calculate_confidence_score(self, intent, expected):
+        """Each candidate intent for one request is scored on its own evidence"""
+        assert IntentValidator().calculate_confidence_score(intent, self._REQUEST) == pytest.approx(expected)
+
+    @pytest.mark.parametrize("intent", [
+        {"integrations": ["Slack"], "trigger_type": "manual", "action": "Post a daily summary"},
+        {"integrations": ["Slack", "Webhook"], "trigger_type": "webhook", "action": "Post to Slack on webhook"},
+    ], ids=["corrected", "kept"])
+    def test_shared_trigger_counts_match_fresh_scan(self, intent):
+        """Counts computed once give the same validation and score as each step scanning on its own"""
+        validator = IntentValidator()
+        request_lower = self._REQUEST.lower()
+        trigger_counts = validator.count_trigger_matches(request_lower)
+
+        assert trigger_counts == {
+            trigger_type: validator._count_matches(checks, request_lower)
+            for trigger_type, checks in validator.TRIGGER_CHECKS.items()
+        }
+
+        shared_intent, shared_corrections = validator.validate_and_correct_intent(
+            copy.deepcopy(intent), self._REQUEST, request_lower, trigger_counts
+        )
+        fresh_intent, fresh_corrections = validator.validate_and_correct_intent(copy.deepcopy(intent), self._REQUEST)
+        assert (shared_intent, shared_corrections) == (fresh_intent, fresh_corrections)
+
+        assert validator.calculate_confidence_score(
+            shared_intent, self._REQUEST, request_lower, trigger_counts
+        ) == validator.calculate_confidence_score(fresh_intent, self._REQUEST)
 
 
 class TestN8nClient:
     """Unit tests for n8n Client"""
     
-    @pytest.fixture
-    def n8n_client(self):
-        """Create n8n client instance for testing"""
+    @pytest.fixture(scope="class")
+    @classmethod
+    def _n8n_client(cls):
+        """n8n client built once for the class"""
         return N8nClient(base_url="http://test-n8n:5678")
     
-    @pytest.mark.unit
-    def test_n8n_client_init(self, n8n_client):
+    @pytest.fixture
+    def n8n_client(self, _n8n_client):
+        """Shared n8n client whose API path is already detected as /api/v1
+        
+        Only the detection tests clear it; everything else skips the probe.
+        """
+        _n8n_client.api_path = "/api/v1"
+        return _n8n_client
+    
+    def test_n8n_client_init(self):
         """Test n8n client initialization"""
+        n8n_client = N8nClient(base_url="http://test-n8n:5678")
+        
         assert n8n_client.base_url == "http://test-n8n:5678"
         assert n8n_client.api_path is None
         assert n8n_client.timeout.read == 30.0
     
-    @pytest.mark.unit
-    async def test_detect_api_path_v1(self, n8n_client):
-        """Test API path detection for /api/v1"""
-        with patch('httpx.AsyncClient') as mock_client:
-            mock_response = Mock()
-            mock_response.status_code = 200
-            mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
-            
-            api_path = await n8n_client.detect_api_path()
-            
-            assert api_path == "/api/v1"
-            assert n8n_client.api_path == "/api/v1"
-    
-    @pytest.mark.unit
-    async def test_detect_api_path_rest(self, n8n_client):
-        """Test API path detection for /rest"""
-        with patch('httpx.AsyncClient') as mock_client:
-            # First call to /api/v1 fails, second call to /rest succeeds
-            mock_client.return_value.__aenter__.return_value.get.side_effect = [
-                httpx.RequestError("Connection failed"),
-                Mock(status_code=200)
-            ]
-            
-            api_path = await n8n_client.detect_api_path()
-            
-            assert api_path == "/rest"
-            assert n8n_client.api_path == "/rest"
-    
-    @pytest.mark.unit
-    async def test_detect_api_path_fallback(self, n8n_client):
-        """Test API path detection fallback"""
-        with patch('httpx.AsyncClient') as mock_client:
-            # Both API paths fail
-            mock_client.return_value.__aenter__.return_value.get.side_effect = [
-                httpx.RequestError("Connection failed"),
-                httpx.RequestError("Connection failed")
-            ]
-            
-            api_path = await n8n_client.detect_api_path()
-            
-            assert api_path == "/api/v1"  # Default fallback
-            assert n8n_client.api_path == "/api/v1"
+    @pytest.mark.parametrize("get_outcomes,expected", [
+        ((SimpleNamespace(status_code=200),), "/api/v1"),
+        # First call to /api/v1 fails, second call to /rest succeeds
+        ((httpx.RequestError("Connection failed"), SimpleNamespace(status_code=200)), "/rest"),
+        # Both API paths fail, so detection falls back to the default
+        ((httpx.RequestError("Connection failed"), httpx.RequestError("Connection failed")), "/api/v1"),
+    ], ids=["v1", "rest", "fallback"])
+    async def test_detect_api_path(self, async_context, n8n_client, get_outcomes, expected):
+        """Test API path detection across the probed endpoints"""
+        n8n_client.api_path = None
+        async_context.get.side_effect = get_outcomes
+        
+        api_path = await n8n_client.detect_api_path()
+        
+        assert api_path == expected
+        assert n8n_client.api_path == expected
     
-    @pytest.mark.unit
-    async def test_create_workflow_success(self, n8n_client):
+    async def test_create_workflow_success(self, async_context, n8n_client):
         """Test successful workflow creation"""
         workflow_json = {
             "name": "Test Workflow",
@@ -288,24 +590,17 @@ class TestN8nClient:
             "connections": workflow_json["connections"]
         }
         
-        with patch.object(n8n_client, 'detect_api_path', return_value="/api/v1"), \
-             patch('httpx.AsyncClient') as mock_client:
-            
-            mock_response = Mock()
-            mock_response.json.return_value = mock_response_data
-            mock_response.raise_for_status.return_value = None
-            mock_client.return_value.__aenter__.return_value.post.return_value = mock_response
-            
-            result = await n8n_client.create_workflow(workflow_json, activate=False)
-            
-            assert result["id"] == "12345"
-            assert result["name"] == "Test Workflow"
-            assert result["active"] is False
-            assert "editorUrl" in result
-            assert result["editorUrl"] == "http://n8n.localhost/workflow/12345"
-    
-    @pytest.mark.unit
-    async def test_create_workflow_with_activation(self, n8n_client):
+        set_response(async_context, "post", json_body=mock_response_data)
+        
+        result = await n8n_client.create_workflow(workflow_json, activate=False)
+        
+        assert result["id"] == "12345"
+        assert result["name"] == "Test Workflow"
+        assert result["active"] is False
+        assert "editorUrl" in result
+        assert result["editorUrl"] == "http://n8n.localhost/workflow/12345"
+    
+    async def test_create_workflow_with_activation(self, async_context, n8n_client):
         """Test workflow creation with activation"""
         workflow_json = {"name": "Test Active Workflow"}
         
@@ -315,128 +610,59 @@ class TestN8nClient:
             "active": True
         }
         
-        with patch.object(n8n_client, 'detect_api_path', return_value="/api/v1"), \
-             patch('httpx.AsyncClient') as mock_client:
-            
-            mock_response = Mock()
-            mock_response.json.return_value = mock_response_data
-            mock_response.raise_for_status.return_value = None
-            mock_client.return_value.__aenter__.return_value.post.return_value = mock_response
-            
-            result = await n8n_client.create_workflow(workflow_json, activate=True)
-            
-            assert result["active"] is True
+        set_response(async_context, "post", json_body=mock_response_data)
+        
+        result = await n8n_client.create_workflow(workflow_json, activate=True)
+        
+        assert result["active"] is True
     
-    @pytest.mark.unit
-    async def test_create_workflow_http_error(self, n8n_client):
+    async def test_create_workflow_http_error(self, async_context, no_sleep, n8n_client):
         """Test workflow creation HTTP error handling"""
         workflow_json = {"name": "Test Workflow"}
         
-        with patch.object(n8n_client, 'detect_api_path', return_value="/api/v1"), \
-             patch('httpx.AsyncClient') as mock_client:
-            
-            mock_response = Mock()
-            mock_response.status_code = 400
-            mock_response.text = "Bad request"
-            
-            http_error = httpx.HTTPStatusError(
-                "400 Bad Request", 
-                request=Mock(), 
-                response=mock_response
-            )
-            mock_client.return_value.__aenter__.return_value.post.return_value.raise_for_status.side_effect = http_error
-            
-            with pytest.raises(Exception, match="n8n API error: 400"):
-                await n8n_client.create_workflow(workflow_json)
+        set_response(async_context, "post", raises=_HTTP_400, status=400)
+        
+        with pytest.raises(Exception, match="n8n API error: 400"):
+            await n8n_client.create_workflow(workflow_json)
     
-    @pytest.mark.unit
-    async def test_activate_workflow_success(self, n8n_client):
+    async def test_activate_workflow_success(self, async_context, n8n_client):
         """Test successful workflow activation"""
-        with patch.object(n8n_client, 'detect_api_path', return_value="/api/v1"), \
-             patch('httpx.AsyncClient') as mock_client:
-            
-            mock_response = Mock()
-            mock_response.raise_for_status.return_value = None
-            mock_client.return_value.__aenter__.return_value.patch.return_value = mock_response
-            
-            result = await n8n_client.activate_workflow("12345")
-            
-            assert result is True
+        set_response(async_context, "patch")
+        
+        result = await n8n_client.activate_workflow("12345")
+        
+        assert result is True
     
-    @pytest.mark.unit
-    async def test_activate_workflow_failure(self, n8n_client):
+    async def test_activate_workflow_failure(self, async_context, n8n_client):
         """Test workflow activation failure"""
-        with patch.object(n8n_client, 'detect_api_path', return_value="/api/v1"), \
-             patch('httpx.AsyncClient') as mock_client:
-            
-            mock_response = Mock()
-            mock_response.status_code = 404
-            mock_response.text = "Workflow not found"
-            
-            http_error = httpx.HTTPStatusError(
-                "404 Not Found", 
-                request=Mock(), 
-                response=mock_response
-            )
-            mock_client.return_value.__aenter__.return_value.patch.return_value.raise_for_status.side_effect = http_error
-            
-            result = await n8n_client.activate_workflow("nonexistent")
-            
-            assert result is False
+        set_response(async_context, "patch", raises=_HTTP_404, status=404)
+        
+        result = await n8n_client.activate_workflow("nonexistent")
+        
+        assert result is False
     
-    @pytest.mark.unit
-    async def test_list_workflows_array_response(self, n8n_client):
-        """Test listing workflows with array response"""
-        mock_workflows = [
-            {"id": "1", "name": "Workflow 1", "active": True},
-            {"id": "2", "name": "Workflow 2", "active": False}
-        ]
+    @pytest.mark.parametrize("api_path,payload", [
+        ("/api/v1", _MOCK_WORKFLOWS),
+        ("/rest", {"data": _MOCK_WORKFLOWS}),
+    ], ids=["array_response", "object_response"])
+    async def test_list_workflows(self, async_context, n8n_client, api_path, payload):
+        """Test listing workflows from both a bare array and a data-wrapped object"""
+        set_response(async_context, "get", json_body=payload)
+        n8n_client.api_path = api_path
         
-        with patch.object(n8n_client, 'detect_api_path', return_value="/api/v1"), \
-             patch('httpx.AsyncClient') as mock_client:
-            
-            mock_response = Mock()
-            mock_response.json.return_value = mock_workflows
-            mock_response.raise_for_status.return_value = None
-            mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
-            
-            result = await n8n_client.list_workflows()
-            
-            assert result == mock_workflows
-            assert len(result) == 2
-    
-    @pytest.mark.unit
-    async def test_list_workflows_object_response(self, n8n_client):
-        """Test listing workflows with object response containing data field"""
-        mock_workflows = [
-            {"id": "1", "name": "Workflow 1", "active": True},
-            {"id": "2", "name": "Workflow 2", "active": False}
-        ]
+        result = await n8n_client.list_workflows()
         
-        with patch.object(n8n_client, 'detect_api_path', return_value="/rest"), \
-             patch('httpx.AsyncClient') as mock_client:
-            
-            mock_response = Mock()
-            mock_response.json.return_value = {"data": mock_workflows}
-            mock_response.raise_for_status.return_value = None
-            mock_client.return_value.__aenter__.return_value.get.return_value = mock_response
-            
-            result = await n8n_client.list_workflows()
-            
-            assert result == mock_workflows
-            assert len(result) == 2
+        assert result == _MOCK_WORKFLOWS
+        assert len(result) == 2
     
-    @pytest.mark.unit
     async def test_test_connection_success(self, n8n_client):
         """Test successful connection test"""
-        with patch.object(n8n_client, 'detect_api_path', return_value="/api/v1"), \
-             patch.object(n8n_client, 'list_workflows', return_value=[]):
+        with patch.object(n8n_client, 'list_workflows', return_value=[]):
             
             result = await n8n_client.test_connection()
             
             assert result is True
     
-    @pytest.mark.unit
     async def test_test_connection_failure(self, n8n_client):
         """Test connection test failure"""
         with patch.object(n8n_client, 'detect_api_path', side_effect=Exception("Connection failed")):
@@ -449,27 +675,33 @@ class TestN8nClient:
 class TestLangGraphAgent:
     """Unit tests for LangGraph Agent components"""
     
-    @pytest.fixture
-    def mock_llm_client(self):
+    @pytest.fixture(scope="class")
+    @classmethod
+    def mock_llm_client(cls):
         """Mock LLM client"""
-        mock = Mock(spec=LLMClient)
-        mock.generate_text = AsyncMock()
-        return mock
+        return AsyncMock(spec=LLMClient)
     
-    @pytest.fixture
-    def mock_n8n_client(self):
+    @pytest.fixture(scope="class")
+    @classmethod
+    def mock_n8n_client(cls):
         """Mock n8n client"""
-        mock = Mock(spec=N8nClient)
-        mock.create_workflow = AsyncMock()
+        mock = AsyncMock(spec=N8nClient)
         mock.base_url = "http://test-n8n:5678"
         return mock
     
-    @pytest.fixture
-    def workflow_agent(self, mock_llm_client, mock_n8n_client):
+    @pytest.fixture(scope="class")
+    @classmethod
+    def workflow_agent(cls, agent_module, mock_llm_client, mock_n8n_client):
         """Create workflow agent with mocked clients"""
-        return WorkflowAgent(mock_llm_client, mock_n8n_client)
+        return agent_module.WorkflowAgent(mock_llm_client, mock_n8n_client)
+    
+    @pytest.fixture(autouse=True)
+    def _reset_client_mocks(self, mock_llm_client, mock_n8n_client):
+        """Clear replies a test stubbed on the shared client mocks"""
+        yield
+        mock_llm_client.reset_mock(return_value=True, side_effect=True)
+        mock_n8n_client.reset_mock(return_value=True, side_effect=True)
     
-    @pytest.mark.unit
     def test_workflow_agent_initialization(self, workflow_agent, mock_llm_client, mock_n8n_client):
         """Test workflow agent initialization"""
         assert workflow_agent.llm_client == mock_llm_client
@@ -478,76 +710,31 @@ class TestLangGraphAgent:
         assert workflow_agent.confidence_threshold == 0.7
         assert workflow_agent.graph is not None
     
-    @pytest.mark.unit
     async def test_parse_intent_success(self, workflow_agent):
         """Test successful intent parsing"""
-        mock_intent = {
-            "integrations": ["slack"],
-            "trigger_type": "webhook",
-            "action": "send_message",
-            "requirements": [],
-            "complexity": "simple"
-        }
-        
-        workflow_agent.llm_client.generate_text.return_value = json.dumps(mock_intent)
+        workflow_agent.llm_client.generate_text.return_value = _SLACK_INTENT_JSON
         
-        state = WorkflowState(
-            user_query="Send Slack message when webhook triggered",
-            intent=None,
-            candidates=None,
-            selected_workflow=None,
-            workflow_created=None,
-            error=None,
-            confidence_score=None,
-            retry_count=0
-        )
+        state = make_state(user_query="Send Slack message when webhook triggered")
         
         result = await workflow_agent._parse_intent(state)
         
-        assert result["intent"] == mock_intent
+        assert result["intent"] == _SLACK_INTENT
         assert result["error"] is None
     
-    @pytest.mark.unit
     async def test_parse_intent_json_error(self, workflow_agent):
         """Test intent parsing with JSON error"""
         workflow_agent.llm_client.generate_text.return_value = "Invalid JSON response"
         
-        state = WorkflowState(
-            user_query="Test query",
-            intent=None,
-            candidates=None,
-            selected_workflow=None,
-            workflow_created=None,
-            error=None,
-            confidence_score=None,
-            retry_count=0
-        )
+        state = make_state(user_query="Test query")
         
         result = await workflow_agent._parse_intent(state)
         
         assert result["intent"] is None
         assert "Failed to parse intent" in result["error"]
     
-    @pytest.mark.unit
     async def test_search_templates_success(self, workflow_agent):
         """Test successful template search"""
-        mock_intent = {
-            "integrations": ["slack", "webhook"],
-            "trigger_type": "webhook",
-            "action": "send_message",
-            "requirements": []
-        }
-        
-        state = WorkflowState(
-            user_query="Test query",
-            intent=mock_intent,
-            candidates=None,
-            selected_workflow=None,
-            workflow_created=None,
-            error=None,
-            confidence_score=None,
-            retry_count=0
-        )
+        state = make_state(user_query="Test query", intent=_MOCK_INTENT_SLACK_WEBHOOK)
         
         result = await workflow_agent._search_templates(state)
         
@@ -555,44 +742,15 @@ class TestLangGraphAgent:
         assert len(result["candidates"]) > 0
         assert result["error"] is None
     
-    @pytest.mark.unit
     async def test_score_candidates_success(self, workflow_agent):
         """Test successful candidate scoring"""
-        mock_candidates = [
-            {
-                "id": "template1",
-                "name": "Slack Webhook",
-                "description": "Send Slack messages via webhook",
-                "integrations": ["slack", "webhook"],
-                "category": "messaging"
-            },
-            {
-                "id": "template2", 
-                "name": "Email Alert",
-                "description": "Send email alerts",
-                "integrations": ["email"],
-                "category": "notifications"
-            }
-        ]
-        
-        mock_intent = {
-            "integrations": ["slack"],
-            "trigger_type": "webhook",
-            "action": "send_message"
-        }
-        
         # Mock LLM to return different scores
         workflow_agent.llm_client.generate_text.side_effect = ["0.85", "0.45"]
         
-        state = WorkflowState(
+        state = make_state(
             user_query="Test query",
-            intent=mock_intent,
-            candidates=mock_candidates,
-            selected_workflow=None,
-            workflow_created=None,
-            error=None,
-            confidence_score=None,
-            retry_count=0
+            intent=_MOCK_INTENT_SLACK,
+            candidates=_MOCK_CANDIDATES_SLACK_EMAIL
         )
         
         result = await workflow_agent._score_candidates(state)
@@ -604,34 +762,9 @@ class TestLangGraphAgent:
         assert result["confidence_score"] == 0.85
         assert result["error"] is None
     
-    @pytest.mark.unit
     async def test_select_best_candidate(self, workflow_agent):
         """Test selecting the best candidate"""
-        mock_candidates = [
-            {
-                "id": "template1",
-                "name": "Best Template",
-                "description": "The best matching template",
-                "score": 0.95
-            },
-            {
-                "id": "template2",
-                "name": "Second Template", 
-                "description": "Second best template",
-                "score": 0.75
-            }
-        ]
-        
-        state = WorkflowState(
-            user_query="Test query",
-            intent=None,
-            candidates=mock_candidates,
-            selected_workflow=None,
-            workflow_created=None,
-            error=None,
-            confidence_score=None,
-            retry_count=0
-        )
+        state = make_state(user_query="Test query", candidates=_MOCK_CANDIDATES_RANKED)
         
         result = await workflow_agent._select_best(state)
         
@@ -641,25 +774,24 @@ class TestLangGraphAgent:
         assert result["selected_workflow"]["score"] == 0.95
         assert result["error"] is None
     
-    @pytest.mark.unit
-    async def test_conditional_routing_functions(self, workflow_agent):
+    @pytest.mark.parametrize("router,state,expected", [
+        # Intent routing
+        ("_should_continue_after_intent", {"error": "test error"}, "error"),
+        ("_should_continue_after_intent", {"intent": {"test": "data"}}, "search"),
+        ("_should_continue_after_intent", {}, "error"),
+        # Search routing
+        ("_should_continue_after_search", {"error": "test error"}, "error"),
+        ("_should_continue_after_search", {"candidates": []}, "no_results"),
+        ("_should_continue_after_search", {"candidates": [{"id": "test"}]}, "score"),
+        # Scoring routing
+        ("_should_continue_after_scoring", {"error": "test error"}, "error"),
+        ("_should_continue_after_scoring", {"confidence_score": 0.5}, "low_confidence"),
+        ("_should_continue_after_scoring", {"confidence_score": 0.8}, "select"),
+    ])
+    def test_conditional_routing(self, workflow_agent, router, state, expected):
         """Test conditional routing logic"""
-        # Test intent routing
-        assert workflow_agent._should_continue_after_intent({"error": "test error"}) == "error"
-        assert workflow_agent._should_continue_after_intent({"intent": {"test": "data"}}) == "search"
-        assert workflow_agent._should_continue_after_intent({}) == "error"
-        
-        # Test search routing
-        assert workflow_agent._should_continue_after_search({"error": "test error"}) == "error"
-        assert workflow_agent._should_continue_after_search({"candidates": []}) == "no_results"
-        assert workflow_agent._should_continue_after_search({"candidates": [{"id": "test"}]}) == "score"
-        
-        # Test scoring routing
-        assert workflow_agent._should_continue_after_scoring({"error": "test error"}) == "error"
-        assert workflow_agent._should_continue_after_scoring({"confidence_score": 0.5}) == "low_confidence"
-        assert workflow_agent._should_continue_after_scoring({"confidence_score": 0.8}) == "select"
-    
-    @pytest.mark.unit
+        assert getattr(workflow_agent, router)(state) == expected
+    
     async def test_generate_response_success(self, workflow_agent):
         """Test successful response generation"""
         workflow_agent.llm_client.generate_text.return_value = "Your workflow has been successfully created!"
@@ -675,15 +807,10 @@ class TestLangGraphAgent:
             "score": 0.85
         }
         
-        state = WorkflowState(
+        state = make_state(
             user_query="Create test workflow",
-            intent=None,
-            candidates=None,
             selected_workflow=mock_selected_workflow,
-            workflow_created=mock_workflow_created,
-            error=None,
-            confidence_score=None,
-            retry_count=0
+            workflow_created=mock_workflow_created
         )
         
         result = await workflow_agent._generate_response(state)
@@ -691,26 +818,15 @@ class TestLangGraphAgent:
         assert result["user_response"] == "Your workflow has been successfully created!"
         assert result["error"] is None
     
-    @pytest.mark.unit
     async def test_handle_error(self, workflow_agent):
         """Test error handling"""
-        state = WorkflowState(
-            user_query="Test query",
-            intent=None,
-            candidates=None,
-            selected_workflow=None,
-            workflow_created=None,
-            error="Test error occurred",
-            confidence_score=None,
-            retry_count=0
-        )
+        state = make_state(user_query="Test query", error="Test error occurred")
         
         result = await workflow_agent._handle_error(state)
         
         assert "Test error occurred" in result["user_response"]
         assert result["final_status"] == "error"
     
-    @pytest.mark.unit
     async def test_manual_fallback_with_candidates(self, workflow_agent):
         """Test manual fallback with candidate options"""
         mock_candidates = [
@@ -718,16 +834,7 @@ class TestLangGraphAgent:
             {"name": "Option 2", "score": 0.55}
         ]
         
-        state = WorkflowState(
-            user_query="Test query",
-            intent=None,
-            candidates=mock_candidates,
-            selected_workflow=None,
-            workflow_created=None,
-            error=None,
-            confidence_score=0.6,
-            retry_count=0
-        )
+        state = make_state(user_query="Test query", candidates=mock_candidates, confidence_score=0.6)
         
         result = await workflow_agent._manual_fallback(state)
         
@@ -735,45 +842,57 @@ class TestLangGraphAgent:
         assert "Option 2" in result["user_response"]
         assert result["final_status"] == "manual_selection_required"
     
-    @pytest.mark.unit
     async def test_manual_fallback_no_candidates(self, workflow_agent):
         """Test manual fallback with no candidates"""
-        state = WorkflowState(
-            user_query="Test query",
-            intent=None,
-            candidates=[],
-            selected_workflow=None,
-            workflow_created=None,
-            error=None,
-            confidence_score=None,
-            retry_count=0
-        )
+        state = make_state(user_query="Test query", candidates=[])
         
         result = await workflow_agent._manual_fallback(state)
         
         assert "couldn't find any existing workflow templates" in result["user_response"]
         assert result["final_status"] == "manual_selection_required"
+    
+    # Latency guards for the agent's hot path; the LLM is mocked, so these time only agent code
+    
+    async def test_parse_intent_latency(self, workflow_agent):
+        """Guard against regressions in intent parsing overhead"""
+        workflow_agent.llm_client.generate_text.return_value = _SLACK_GMAIL_INTENT_JSON
+        state = make_state(user_query="Send Slack notification when new email arrives")
+        
+        mean_s = await mean_latency(lambda: workflow_agent._parse_intent(state))
+        
+        assert mean_s < _PARSE_INTENT_BUDGET_S
+    
+    async def test_score_candidates_latency(self, workflow_agent):
+        """Guard against regressions in scoring overhead for a full candidate list"""
+        workflow_agent.llm_client.generate_text.return_value = "0.75"
+        state = make_state(
+            user_query="Test query",
+            intent=_MOCK_INTENT_SLACK,
+            candidates=_MOCK_CANDIDATES_SLACK_EMAIL * 5
+        )
+        
+        mean_s = await mean_latency(lambda: workflow_agent._score_candidates(state))
+        
+        assert mean_s < _SCORE_CANDIDATES_BUDGET_S
 
 
 class TestUtilityFunctions:
     """Test utility functions and helpers"""
     
-    @pytest.mark.unit
-    def test_create_workflow_agent_factory(self):
+    def test_create_workflow_agent_factory(self, agent_module):
         """Test workflow agent factory function"""
         mock_llm = Mock()
         mock_n8n = Mock()
         
-        agent = create_workflow_agent(mock_llm, mock_n8n)
+        agent = agent_module.create_workflow_agent(mock_llm, mock_n8n)
         
-        assert isinstance(agent, WorkflowAgent)
+        assert isinstance(agent, agent_module.WorkflowAgent)
         assert agent.llm_client == mock_llm
         assert agent.n8n_client == mock_n8n
     
-    @pytest.mark.unit
-    def test_workflow_state_type_dict(self):
+    def test_workflow_state_type_dict(self, agent_module):
         """Test WorkflowState TypedDict structure"""
-        state = WorkflowState(
+        state = agent_module.WorkflowState(
             user_query="test",
             intent=None,
             candidates=None,
@@ -795,10 +914,10 @@ class TestDataGenerators:
     
     @pytest.fixture
     def sample_workflow_json(self):
-        """Generate sample workflow JSON"""
+        """Generate a fresh sample workflow JSON for each test"""
         return {
-            "id": fake.uuid4(),
-            "name": fake.catch_phrase(),
+            "id": next(_uuid_iter),
+            "name": next(_phrase_iter),
             "nodes": [
                 {
                     "id": "trigger",
@@ -812,7 +931,7 @@ class TestDataGenerators:
                     "typeVersion": 1,
                     "position": [460, 300],
                     "parameters": {
-                        "url": fake.url(),
+                        "url": next(_url_iter),
                         "method": "POST"
                     }
                 }
@@ -829,18 +948,27 @@ class TestDataGenerators:
     
     @pytest.fixture
     def sample_template_candidates(self):
-        """Generate sample template candidates"""
+        """Generate sample template candidates
+        
+        The categorical and score fields are drawn for all candidates up front;
+        Faker is only used for the text fields.
+        """
+        rng = fake.random
+        count = fake.random_int(2, 5)
+        categories = rng.choices(["productivity", "notifications", "data", "automation"], k=count)
+        complexities = rng.choices(["simple", "medium", "complex"], k=count)
+        scores = [rng.uniform(0.3, 0.9) for _ in range(count)]
         return [
             {
-                "id": fake.uuid4(),
+                "id": next(_uuid_iter),
                 "name": f"{fake.word().title()} {fake.word().title()} Integration",
                 "description": fake.text(max_nb_chars=100),
-                "integrations": [fake.word(), fake.word()],
-                "category": fake.random_element(["productivity", "notifications", "data", "automation"]),
-                "complexity": fake.random_element(["simple", "medium", "complex"]),
-                "score": fake.random.uniform(0.3, 0.9)
+                "integrations": fake.words(2),
+                "category": category,
+                "complexity": complexity,
+                "score": score
             }
-            for _ in range(fake.random_int(2, 5))
+            for category, complexity, score in zip(categories, complexities, scores)
         ]
     
     @pytest.fixture 
@@ -4,12 +4,33 @@ Provides post-extraction validation and correction for common classification err
 """
 
 import re
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# The word a pattern's source opens with, and the quantifier that may follow it
+_LEADING_WORD = re.compile(r"\\b([a-z]+)([?*{]?)")
+
+
+def _gated(patterns: List["re.Pattern[str]"]) -> List[Tuple[str, "re.Pattern[str]"]]:
+    """Pair each pattern with the word every match must contain
+    
+    A plain ``word in text`` check is far cheaper than entering the regex engine,
+    and rules most patterns out for a typical request. A quantified last letter
+    (``automated?``) is left off the word; a pattern with no leading word gets ''.
+    """
+    gated = []
+    for pattern in patterns:
+        match = _LEADING_WORD.match(pattern.pattern)
+        word = ""
+        if match:
+            word = match.group(1)[:-1] if match.group(2) else match.group(1)
+        gated.append((word, pattern))
+    return gated
+
+
 class IntentValidator:
     """Validates and corrects LLM-extracted intents using rule-based logic"""
     
@@ -43,55 +64,65 @@ class IntentValidator:
         "spreadsheet": "Sheets",
     }
     
+    # Pattern tables are compiled once at import; the validators call
+    # pattern.search() directly instead of going through re's pattern cache
+    
     # Webhook detection patterns
-    WEBHOOK_PATTERNS = [
+    WEBHOOK_PATTERNS = [re.compile(p) for p in (
         r'\bwebhook\b',
         r'\bhook\b',
-        r'\bhttp.*callback\b',
-        r'\bevent.*trigger\b',
+        r'\bhttp.{0,40}?callback\b',
+        r'\bevent.{0,40}?trigger\b',
         r'\bpayload\b',
-        r'\bpost.*endpoint\b',
-        r'\bincoming.*data\b',
-        r'\bapi.*call\b'
-    ]
+        r'\bpost.{0,40}?endpoint\b',
+        r'\bincoming.{0,40}?data\b',
+        r'\bapi.{0,40}?call\b'
+    )]
     
     # Form detection patterns  
-    FORM_PATTERNS = [
+    FORM_PATTERNS = [re.compile(p) for p in (
         r'\bform\b',
         r'\bsubmission\b',
         r'\bsubmit\b',
-        r'\bcontact.*form\b',
-        r'\bform.*data\b',
-        r'\buser.*input\b'
-    ]
+        r'\bcontact.{0,40}?form\b',
+        r'\bform.{0,40}?data\b',
+        r'\buser.{0,40}?input\b'
+    )]
     
     # Schedule detection patterns
-    SCHEDULE_PATTERNS = [
+    SCHEDULE_PATTERNS = [re.compile(p) for p in (
         r'\bschedule\b',
         r'\bdaily\b',
         r'\bweekly\b',
         r'\bmonthly\b',
         r'\bhourly\b',
-        r'\bevery.*\b',
+        r'\bevery\b',
         r'\bcron\b',
         r'\btimer\b',
         r'\bautomated?\b',
         r'\bregular\b'
-    ]
+    )]
+    
+    # Integrations added when the request mentions them, in the order they are appended
+    DETECTED_INTEGRATIONS = (
+        ("Webhook", _gated(WEBHOOK_PATTERNS)),
+        ("Form", _gated(FORM_PATTERNS)),
+        ("Schedule", _gated(SCHEDULE_PATTERNS)),
+    )
     
     # Trigger type indicators
     TRIGGER_INDICATORS = {
-        'webhook': [
-            r'\bwhen\s+\w+\s+happens?\b',
+        'webhook': [re.compile(p) for p in (
+            r'\bwhen\s+\w{1,32}\s+happens?\b',
             r'\bon\s+\w+\s+submission\b',
             r'\bwebhook\b',
-            r'\bform.*submit\b',
+            r'\bform.{0,40}?submit\b',
             r'\bincoming\b',
-            r'\breceive.*data\b',
-            r'\bapi.*call\b',
-            r'\bevent.*trigger\b'
-        ],
-        'schedule': [
+            r'\breceive.{0,40}?data\b',
+            r'\bapi.{0,40}?call\b',
+            r'\bevent.{0,40}?trigger\b'
+        )],
+        'schedule': [re.compile(p) for p in (
             r'\bevery\s+(day|hour|week|month)\b',
             r'\bdaily\b',
             r'\bweekly\b',
@@ -99,199 +130,207 @@ class IntentValidator:
             r'\bhourly\b',
             r'\bschedule\b',
             r'\bcron\b',
-            r'\bautomatically.*\b',
+            r'\bautomatically\b',
             r'\bat\s+\d+:\d+\b'
-        ],
-        'manual': [
+        )],
+        'manual': [re.compile(p) for p in (
             r'\bmanually?\b',
             r'\blet\s+me\s+(run|start|trigger)\b',
             r'\bi\s+want\s+to\s+(run|start|trigger)\b',
             r'\bstart\s+manually?\b',
             r'\brun\s+on\s+demand\b'
-        ]
+        )]
     }
+    TRIGGER_CHECKS = {trigger_type: _gated(patterns) for trigger_type, patterns in TRIGGER_INDICATORS.items()}
     
-    def validate_and_correct_intent(self, intent: Dict[str, Any], user_request: str) -> Tuple[Dict[str, Any], List[str]]:
+    def validate_and_correct_intent(
+        self,
+        intent: Dict[str, Any],
+        user_request: str,
+        request_lower: Optional[str] = None,
+        trigger_counts: Optional[Dict[str, int]] = None
+    ) -> Tuple[Dict[str, Any], List[str]]:
         """
         Validate and correct extracted intent using rule-based logic
         
         Args:
             intent: Original extracted intent
             user_request: Original user message
+            request_lower: user_request already lowercased, if the caller has it
+            trigger_counts: count_trigger_matches(request_lower), if the caller has it
             
         Returns:
             Tuple of (corrected_intent, list_of_corrections_made)
         """
         corrections = []
         corrected_intent = intent.copy()
-        request_lower = user_request.lower()
+        if request_lower is None:
+            request_lower = user_request.lower()
+        if trigger_counts is None:
+            trigger_counts = self.count_trigger_matches(request_lower)
         
         # Ensure integrations is a list
         if not isinstance(corrected_intent.get('integrations'), list):
             corrected_intent['integrations'] = []
         
-        # 1. Webhook detection validation
-        webhook_corrections = self._validate_webhook_detection(corrected_intent, request_lower)
-        corrections.extend(webhook_corrections)
-        
-        # 2. Form detection validation
-        form_corrections = self._validate_form_detection(corrected_intent, request_lower)
-        corrections.extend(form_corrections)
+        # 1. Webhook, Form and Schedule detection validation, appending to the list in place
+        integrations = corrected_intent['integrations']
+        detection_corrections = self._validate_detected_integrations(integrations, request_lower)
+        corrections.extend(detection_corrections)
         
-        # 3. Schedule detection validation
-        schedule_corrections = self._validate_schedule_detection(corrected_intent, request_lower)
-        corrections.extend(schedule_corrections)
-        
-        # 4. Integration normalization
+        # 2. Integration normalization, which also drops duplicates
+        integration_count = len(integrations)
         normalization_corrections = self._normalize_integrations(corrected_intent, request_lower)
         corrections.extend(normalization_corrections)
         
-        # 5. Trigger type validation and correction
-        trigger_corrections = self._validate_trigger_type(corrected_intent, request_lower)
+        # 3. Trigger type validation and correction
+        trigger_corrections = self._validate_trigger_type(corrected_intent, trigger_counts)
         corrections.extend(trigger_corrections)
         
-        # 6. Remove duplicates from integrations
-        if corrected_intent.get('integrations'):
-            original_count = len(corrected_intent['integrations'])
-            corrected_intent['integrations'] = list(set(corrected_intent['integrations']))
-            if len(corrected_intent['integrations']) < original_count:
-                corrections.append("Removed duplicate integrations")
+        # 4. Report duplicates dropped during normalization
+        if len(corrected_intent['integrations']) < integration_count:
+            corrections.append("Removed duplicate integrations")
         
         logger.info(f"Intent validation complete. Applied {len(corrections)} corrections: {corrections}")
         
         return corrected_intent, corrections
     
-    def _validate_webhook_detection(self, intent: Dict[str, Any], request_lower: str) -> List[str]:
-        """Validate and correct webhook detection"""
-        corrections = []
-        
-        # Check if webhook should be detected
-        webhook_mentioned = any(re.search(pattern, request_lower) for pattern in self.WEBHOOK_PATTERNS)
-        
-        if webhook_mentioned and "Webhook" not in intent.get('integrations', []):
-            intent['integrations'].append("Webhook")
-            corrections.append("Added missing Webhook integration")
-        
-        return corrections
-    
-    def _validate_form_detection(self, intent: Dict[str, Any], request_lower: str) -> List[str]:
-        """Validate and correct form detection"""
-        corrections = []
-        
-        # Check if form should be detected
-        form_mentioned = any(re.search(pattern, request_lower) for pattern in self.FORM_PATTERNS)
-        
-        if form_mentioned and "Form" not in intent.get('integrations', []):
-            intent['integrations'].append("Form")
-            corrections.append("Added missing Form integration")
-        
-        return corrections
-    
-    def _validate_schedule_detection(self, intent: Dict[str, Any], request_lower: str) -> List[str]:
-        """Validate and correct schedule detection"""
+    def _validate_detected_integrations(self, integrations: List[str], request_lower: str) -> List[str]:
+        """Add the Webhook, Form and Schedule integrations the request mentions but the intent lacks"""
         corrections = []
+        present = set(integrations)
         
-        # Check if schedule should be detected
-        schedule_mentioned = any(re.search(pattern, request_lower) for pattern in self.SCHEDULE_PATTERNS)
-        
-        if schedule_mentioned and "Schedule" not in intent.get('integrations', []):
-            intent['integrations'].append("Schedule")
-            corrections.append("Added missing Schedule integration")
+        # Categories the intent already has are not searched for at all
+        for name, checks in self.DETECTED_INTEGRATIONS:
+            if name not in present and any(
+                word in request_lower and pattern.search(request_lower) for word, pattern in checks
+            ):
+                integrations.append(name)
+                corrections.append(f"Added missing {name} integration")
         
         return corrections
     
     def _normalize_integrations(self, intent: Dict[str, Any], request_lower: str) -> List[str]:
-        """Normalize integration names to generic forms"""
+        """Normalize integration names to generic forms, dropping duplicates in first-seen order"""
         corrections = []
         
         if not intent.get('integrations'):
             return corrections
         
-        normalized_integrations = []
+        # dict keys keep insertion order, so deduplication doesn't reorder the list
+        normalized_integrations = {}
         
+        mappings = self.INTEGRATION_MAPPINGS
         for integration in intent['integrations']:
-            integration_lower = integration.lower()
+            # Mapping keys are lowercase, so an already-lowercase name hits without a .lower() copy
+            normalized = mappings.get(integration) or mappings.get(integration.lower())
             
             # Check if integration should be normalized
-            if integration_lower in self.INTEGRATION_MAPPINGS:
-                normalized = self.INTEGRATION_MAPPINGS[integration_lower]
-                normalized_integrations.append(normalized)
+            if normalized:
+                normalized_integrations[normalized] = None
                 corrections.append(f"Normalized '{integration}' to '{normalized}'")
             else:
-                normalized_integrations.append(integration)
+                normalized_integrations[integration] = None
         
-        intent['integrations'] = normalized_integrations
+        intent['integrations'] = list(normalized_integrations)
         return corrections
     
-    def _validate_trigger_type(self, intent: Dict[str, Any], request_lower: str) -> List[str]:
+    def _validate_trigger_type(self, intent: Dict[str, Any], trigger_counts: Dict[str, int]) -> List[str]:
         """Validate and correct trigger type classification"""
         corrections = []
         original_trigger = intent.get('trigger_type', '')
         
-        # Score each trigger type based on pattern matches
-        trigger_scores = {}
-        for trigger_type, patterns in self.TRIGGER_INDICATORS.items():
-            score = sum(1 for pattern in patterns if re.search(pattern, request_lower))
-            if score > 0:
-                trigger_scores[trigger_type] = score
+        # Pick the highest scoring trigger type in one pass; ties keep the first type listed
+        best_trigger, best_score = '', 0
+        for trigger_type, score in trigger_counts.items():
+            if score > best_score:
+                best_trigger, best_score = trigger_type, score
         
-        if not trigger_scores:
+        if not best_score:
             # No clear patterns detected, keep original
             return corrections
         
-        # Get highest scoring trigger type
-        best_trigger = max(trigger_scores.keys(), key=lambda k: trigger_scores[k])
-        
         # Only correct if we have strong evidence (score > 1) or original was "manual" (common mistake)
-        if trigger_scores[best_trigger] > 1 or (original_trigger == "manual" and trigger_scores[best_trigger] >= 1):
+        if best_score > 1 or (original_trigger == "manual" and best_score >= 1):
             if best_trigger != original_trigger:
                 intent['trigger_type'] = best_trigger
                 corrections.append(f"Corrected trigger type from '{original_trigger}' to '{best_trigger}'")
         
         return corrections
     
-    def calculate_confidence_score(self, intent: Dict[str, Any], user_request: str) -> float:
+    @staticmethod
+    def _count_matches(checks: List[Tuple[str, "re.Pattern[str]"]], request_lower: str) -> int:
+        """Count the gated patterns that match the request"""
+        return sum(1 for word, pattern in checks if word in request_lower and pattern.search(request_lower))
+    
+    def count_trigger_matches(self, request_lower: str) -> Dict[str, int]:
+        """
+        Count the indicator patterns each trigger type matches in the request
+        
+        Validation and confidence scoring both need these counts, so a caller running
+        both can compute them once and pass them to each.
+        
+        Args:
+            request_lower: Lowercased user message
+            
+        Returns:
+            Mapping of trigger type to its number of matching indicator patterns
+        """
+        return {
+            trigger_type: self._count_matches(checks, request_lower)
+            for trigger_type, checks in self.TRIGGER_CHECKS.items()
+        }
+    
+    def calculate_confidence_score(
+        self,
+        intent: Dict[str, Any],
+        user_request: str,
+        request_lower: Optional[str] = None,
+        trigger_counts: Optional[Dict[str, int]] = None
+    ) -> float:
         """
         Calculate confidence score for extracted intent
         
         Args:
             intent: Extracted intent
             user_request: Original user message
+            request_lower: user_request already lowercased, if the caller has it
+            trigger_counts: count_trigger_matches(request_lower), if the caller has it
             
         Returns:
             Confidence score between 0.0 and 1.0
         """
         score = 0.0
-        request_lower = user_request.lower()
+        if request_lower is None:
+            request_lower = user_request.lower()
+        
+        integrations = intent.get('integrations', [])
+        trigger_type = intent.get('trigger_type', '')
+        action = intent.get('action', '')
         
         # Base score for valid structure
-        if intent.get('integrations') and intent.get('trigger_type') and intent.get('action'):
+        if integrations and trigger_type and action:
             score += 0.3
         
         # Integration detection confidence
-        integrations = intent.get('integrations', [])
         if integrations:
-            # Check how many integrations have supporting evidence in the text
-            evidence_count = 0
-            for integration in integrations:
-                integration_lower = integration.lower()
-                if integration_lower in request_lower or any(keyword in request_lower 
-                    for keyword in [integration_lower, integration_lower + 's']):
-                    evidence_count += 1
+            # Check how many integrations have supporting evidence in the text;
+            # a plural mention ("emails") contains the singular, so one substring test covers both
+            evidence_count = sum(1 for integration in integrations if integration.lower() in request_lower)
             
-            integration_confidence = evidence_count / len(integrations) if integrations else 0
+            integration_confidence = evidence_count / len(integrations)
             score += integration_confidence * 0.3
         
         # Trigger type confidence
-        trigger_type = intent.get('trigger_type', '')
         if trigger_type in self.TRIGGER_INDICATORS:
-            patterns = self.TRIGGER_INDICATORS[trigger_type]
-            pattern_matches = sum(1 for pattern in patterns if re.search(pattern, request_lower))
+            if trigger_counts is not None:
+                pattern_matches = trigger_counts[trigger_type]
+            else:
+                pattern_matches = self._count_matches(self.TRIGGER_CHECKS[trigger_type], request_lower)
             trigger_confidence = min(pattern_matches / 2, 1.0)  # Normalize to max 1.0
             score += trigger_confidence * 0.2
         
         # Action description quality
-        action = intent.get('action', '')
         if action and len(action) > 10 and not action == user_request:
             score += 0.2
         
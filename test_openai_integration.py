@@ -15,7 +15,11 @@ class OpenAIIntegrationTester:
     
     def __init__(self, base_url: str = "http://localhost:8001"):
         self.base_url = base_url.rstrip('/')
-        self.client = httpx.AsyncClient(timeout=30.0)
+        # One keep-alive pool shared by all checks, which run concurrently against the same host
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=30.0)
+        )
     
     async def close(self):
         """Close the HTTP client"""
@@ -106,11 +110,16 @@ class OpenAIIntegrationTester:
             ("Chat Completions Endpoint", self.test_chat_completions_endpoint),
         ]
         
+        # The endpoint checks are independent, so run them concurrently
+        print(f"\n📋 Running {', '.join(test_name for test_name, _ in tests)}...")
+        outcomes = await asyncio.gather(*(test_func() for _, test_func in tests), return_exceptions=True)
+        
         results = []
-        for test_name, test_func in tests:
-            print(f"\n📋 Running {test_name}...")
-            result = await test_func()
-            results.append((test_name, result))
+        for (test_name, _), outcome in zip(tests, outcomes):
+            if isinstance(outcome, BaseException):
+                print(f"❌ {test_name} error: {str(outcome)}")
+                outcome = False
+            results.append((test_name, outcome))
         
         print("\n" + "=" * 50)
         print("📊 Test Results Summary:")